@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+bench_owner_count.py
+Micro-benchmark for CODEOWNERS owner counting on large (monorepo-sized) files.
+
+Builds a synthetic CODEOWNERS of the requested size, base64-encodes it the way the
+contents API does (wrapped at 60 columns), and times the previous decode-everything +
+per-line HANDLE_RE counter against the scanner's own counting path: the streaming
+decode (iter_content_b64) feeding each chunk to OwnerCounter, as scan_codeowners()
+does while it parses the same chunk. Both must report the same owner count.
+
+Usage examples:
+  python bench_owner_count.py
+  python bench_owner_count.py --mb 4 8 32 --repeat 5
+"""
+
+import argparse
+import base64
+import random
+import time
+
+import codeowners_scan as cs
+
+
+def legacy_count(content_b64):
+    """Owner counting as it was before the streaming tokenizer."""
+    try:
+        text = base64.b64decode(content_b64).decode("utf-8", errors="ignore")
+    except Exception:
+        return 0
+    owners = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for m in cs.HANDLE_RE.findall(line):
+            owners.add(m.lower())
+    return len(owners)
+
+
+def scanner_count(content_b64):
+    """owners_count as codeowners_scan.scan_codeowners() computes it for contents-API content."""
+    counter = cs.OwnerCounter()
+    for data in cs.iter_content_b64(content_b64):
+        counter.feed(data)
+    return counter.count()
+
+
+def synthetic_codeowners(size_bytes, n_owners=3000, seed=0):
+    """CODEOWNERS text of ~size_bytes: rules, comments, blank lines, teams and emails."""
+    rng = random.Random(seed)
+    owners = [f"@user{i}" for i in range(n_owners // 2)]
+    owners += [f"@Org/team-{i}" for i in range(n_owners - len(owners))]
+    lines, size = [], 0
+    while size < size_bytes:
+        roll = rng.random()
+        if roll < 0.15:
+            line = f"# section {len(lines)}: owned by @ignored{len(lines)}"
+        elif roll < 0.2:
+            line = ""
+        else:
+            depth = rng.randint(1, 5)
+            path = "/".join(f"dir{rng.randint(0, 999)}" for _ in range(depth))
+            picked = rng.sample(owners, rng.randint(1, 4))
+            if rng.random() < 0.1:
+                picked.append(f"dev{rng.randint(0, 99)}@example.com")
+            line = f"/{path}/ " + " ".join(picked)
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+
+def github_b64(text):
+    """Base64 the way the contents API returns it (newline every 60 characters)."""
+    flat = base64.b64encode(text.encode()).decode()
+    return "\n".join(flat[i:i + 60] for i in range(0, len(flat), 60)) + "\n"
+
+
+def best_of(fn, arg, repeat):
+    """(result, best wall time in seconds) over 'repeat' runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark CODEOWNERS owner counting.")
+    ap.add_argument("--mb", type=float, nargs="+", default=[1, 4, 16], help="File sizes in MB (default: 1 4 16)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per measurement; best is reported (default: 3)")
+    args = ap.parse_args()
+
+    print(f"{'size':>8} {'owners':>7} {'legacy MB/s':>12} {'scanner MB/s':>13} {'speedup':>8}")
+    for mb in args.mb:
+        text = synthetic_codeowners(int(mb * 1024 * 1024))
+        content_b64 = github_b64(text)
+        size_mb = len(text) / (1024 * 1024)
+        old, t_old = best_of(legacy_count, content_b64, args.repeat)
+        new, t_new = best_of(scanner_count, content_b64, args.repeat)
+        assert old == new, f"owner counts differ: legacy={old} scanner={new}"
+        print(f"{size_mb:>6.1f}MB {new:>7} {size_mb / t_old:>12.1f} {size_mb / t_new:>13.1f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
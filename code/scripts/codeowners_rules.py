@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+codeowners_rules.py
+Parse a CODEOWNERS file into an ordered, compact rule table.
+
+Each rule keeps its pattern, owners, 1-based line number and section. Owners are
+interned once per file (a rule stores owner ids, not strings) and the per-rule
+columns are array-backed, so a table for a monorepo file with tens of thousands of
+rules stays small. Rule order is file order: as on GitHub, the LAST rule whose
+pattern matches a path owns it (see RuleTable.owning_rule()).
+
+Syntax handled (GitHub's gitignore-style CODEOWNERS):
+  - '#' comment lines, and inline comments starting at a whitespace-separated '#'
+  - '\\' escapes ('\\#' for a pattern starting with '#', '\\ ' for a space in a path)
+  - owners as @user, @org/team or an email address (case-insensitive)
+  - a rule without owners (the matching paths have no code owner)
+  - '[Section]' / '^[Section][2] ...' headers (GitLab syntax) name the section of the
+    rules below them; GitHub has no sections, so files without headers use ''.
+Lines GitHub would skip (negation '!', '[ ]' ranges, unparsable owners) are left out
+of the table and reported in RuleTable.errors as (line, message).
+
+For resolving many paths, PathMatcher (RuleTable.matcher()) indexes the rules by
+their literal parts so each lookup only tests a handful of candidate rules.
+
+Usage examples:
+  python codeowners_rules.py path/to/CODEOWNERS
+  git ls-files | python codeowners_rules.py path/to/CODEOWNERS --paths -
+"""
+
+import argparse
+import re
+import statistics
+import sys
+from array import array
+from collections import namedtuple
+
+# ---------- Config ----------
+USER_RE  = re.compile(r'@[A-Za-z0-9](?:[A-Za-z0-9-]{0,38})')
+TEAM_RE  = re.compile(r'@[A-Za-z0-9](?:[A-Za-z0-9-]{0,38})/[A-Za-z0-9_.-]+')
+EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+SECTION_RE = re.compile(r'^\^?\[([^\]]+)\](?:\[\d+\])?(?:\s|$)')
+
+CATCH_ALL_PATTERNS = {"*", "**", "/**", "**/*", "/**/*"}   # patterns that match every path
+
+OWNER_USER, OWNER_TEAM, OWNER_EMAIL = "user", "team", "email"
+
+Rule = namedtuple("Rule", "pattern owners line section")
+
+# ---------- Tokenizing ----------
+def split_line(line):
+    """
+    Split a CODEOWNERS line into tokens on unescaped whitespace, dropping an inline
+    comment (a token that starts with an unescaped '#'). Escapes are kept in the
+    tokens; pattern_regex() resolves them.
+    """
+    if "\\" not in line and "#" not in line:
+        return line.split()
+    tokens, buf, escaped, in_token = [], [], False, False
+    for ch in line:
+        if escaped:
+            buf.append(ch)
+            escaped = False
+        elif ch == "\\":
+            buf.append(ch)
+            escaped = in_token = True
+        elif ch.isspace():
+            if in_token:
+                tokens.append("".join(buf))
+                buf, in_token = [], False
+        elif ch == "#" and not in_token:
+            break
+        else:
+            buf.append(ch)
+            in_token = True
+    if in_token:
+        tokens.append("".join(buf))
+    return tokens
+
+def has_unescaped(token, chars):
+    """True if 'token' contains one of 'chars' not preceded by a '\\' escape."""
+    escaped = False
+    for ch in token:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch in chars:
+            return True
+    return False
+
+def owner_kind(owner):
+    """OWNER_USER / OWNER_TEAM / OWNER_EMAIL, or None if 'owner' is not a valid owner."""
+    if TEAM_RE.fullmatch(owner):
+        return OWNER_TEAM
+    if USER_RE.fullmatch(owner):
+        return OWNER_USER
+    if EMAIL_RE.fullmatch(owner):
+        return OWNER_EMAIL
+    return None
+
+# ---------- Pattern compilation ----------
+def pattern_regex(pattern):
+    """
+    Translate a CODEOWNERS pattern to an anchored regex over repo-relative paths
+    (no leading '/'). gitignore rules: a leading or inner '/' anchors the pattern to
+    the root, otherwise it matches at any depth; a trailing '/' matches only what is
+    inside that directory; a plain name also matches everything below a directory
+    of that name, but a wildcard last segment ('docs/*') matches only that level.
+    """
+    anchored = pattern.startswith("/") or "/" in pattern.rstrip("/")
+    dir_only = pattern.endswith("/")
+    body = pattern.strip("/")
+    out, i = [], 0
+    while i < len(body):
+        if body.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif body.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif body[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif body[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif body[i] == "\\" and i + 1 < len(body):
+            out.append(re.escape(body[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(body[i]))
+            i += 1
+    last = body.rsplit("/", 1)[-1]
+    if dir_only:
+        suffix = "/.*"
+    elif has_unescaped(last, "*?"):
+        suffix = ""
+    else:
+        suffix = "(?:/.*)?"
+    prefix = "" if anchored else "(?:.*/)?"
+    return "^" + prefix + "".join(out) + suffix + "$"
+
+# ---------- Rule table ----------
+class RuleTable:
+    """
+    Ordered CODEOWNERS rules in columnar form. Owner ids index 'owners' (interned,
+    lowercased); rule i owns owner_refs[owner_offsets[i]:owner_offsets[i + 1]].
+    """
+
+    def __init__(self):
+        self.owners = []              # owner id -> owner string
+        self.owner_ids = {}           # owner string -> owner id
+        self.sections = [""]          # section id -> name
+        self.patterns = []            # rule -> pattern, as written
+        self.lines = array("I")       # rule -> 1-based line number
+        self.rule_sections = array("I")
+        self.owner_offsets = array("I", [0])
+        self.owner_refs = array("I")
+        self.errors = []              # (line, message) for lines GitHub would skip
+        self._regexes = None
+        self._matcher = None
+
+    def intern_owner(self, owner):
+        owner = owner.lower()
+        oid = self.owner_ids.get(owner)
+        if oid is None:
+            oid = self.owner_ids[owner] = len(self.owners)
+            self.owners.append(owner)
+        return oid
+
+    def add_rule(self, pattern, owners, line, section=0):
+        self.patterns.append(pattern)
+        self.lines.append(line)
+        self.rule_sections.append(section)
+        self.owner_refs.extend(self.intern_owner(o) for o in owners)
+        self.owner_offsets.append(len(self.owner_refs))
+        self._regexes = self._matcher = None
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __iter__(self):
+        return (self.rule(i) for i in range(len(self)))
+
+    def owner_ids_of(self, i):
+        """Owner ids of rule i."""
+        return self.owner_refs[self.owner_offsets[i]:self.owner_offsets[i + 1]]
+
+    def owners_of(self, i):
+        """Owner strings of rule i, in file order."""
+        return tuple(self.owners[oid] for oid in self.owner_ids_of(i))
+
+    def rule(self, i):
+        return Rule(self.patterns[i], self.owners_of(i), self.lines[i], self.sections[self.rule_sections[i]])
+
+    def owning_rule(self, path):
+        """
+        Index of the rule that owns 'path' (last match wins), or None.
+        Reference implementation: tests every rule, newest first.
+        """
+        if self._regexes is None:
+            self._regexes = [re.compile(pattern_regex(p)) for p in self.patterns]
+        path = path.lstrip("/")
+        for i in range(len(self._regexes) - 1, -1, -1):
+            if self._regexes[i].match(path):
+                return i
+        return None
+
+    def owners_for(self, path):
+        """Owners required for 'path' (empty if no rule or an owner-less rule owns it)."""
+        i = self.owning_rule(path)
+        return () if i is None else self.owners_of(i)
+
+    def matcher(self):
+        """The table's PathMatcher (built on first use)."""
+        if self._matcher is None:
+            self._matcher = PathMatcher(self)
+        return self._matcher
+
+# ---------- Path matching ----------
+def unescape_literal(segment):
+    """'segment' with escapes resolved, or None if it contains an unescaped wildcard."""
+    if has_unescaped(segment, "*?"):
+        return None
+    return re.sub(r'\\(.)', r'\1', segment)
+
+class PathMatcher:
+    """
+    Resolves owning rules without testing every rule in order. Each rule is filed
+    under the literal part of its pattern, and a lookup gathers only the rules whose
+    literal part occurs in the path before running their regexes, newest first:
+      - anchored rules ('/docs/', 'src/*/x') in a trie keyed by their leading literal
+        directory segments, walked along the path's own segments;
+      - floating names ('logs', 'apps/', '**/vendor') by segment name;
+      - floating basename globs ('*.js', '*_test.go', '*') by literal suffix;
+      - anything else ('**/a/*/b', 'foo*bar') in a short always-tested list.
+    Results agree with RuleTable.owning_rule().
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.regexes = [re.compile(pattern_regex(p)).match for p in table.patterns]
+        self.trie = {}          # segment -> child node; rule ids under key None
+        self.by_name = {}       # floating literal name -> [(rule, dir_only)]
+        self.by_suffix = {}     # basename literal suffix -> [rule]
+        self.always = []
+        for i, pattern in enumerate(table.patterns):
+            self._index(i, pattern)
+
+    def _index(self, i, pattern):
+        dir_only = pattern.endswith("/")
+        anchored = pattern.startswith("/") or "/" in pattern.rstrip("/")
+        segments = pattern.strip("/").split("/")
+        floating = False
+        while len(segments) > 1 and segments[0] == "**":
+            segments.pop(0)
+            floating = True
+        if floating and len(segments) > 1:
+            self.always.append(i)         # '**/a/b': matches at any depth
+            return
+        if not anchored or floating:      # '**/name' floats like 'name'
+
+            name = segments[0]
+            literal = unescape_literal(name)
+            if literal is not None:
+                self.by_name.setdefault(literal, []).append((i, dir_only))
+                return
+            if not dir_only and name.startswith("*") and unescape_literal(name[1:]) is not None:
+                self.by_suffix.setdefault(unescape_literal(name[1:]), []).append(i)
+                return
+            self.always.append(i)
+            return
+        node = self.trie
+        for segment in segments:
+            literal = unescape_literal(segment)
+            if literal is None or segment == "**":
+                break
+            node = node.setdefault(literal, {})
+        node.setdefault(None, []).append(i)
+
+    def candidates(self, path):
+        """Rule ids that could match 'path' (a superset of the matching ones)."""
+        segments = path.split("/")
+        found = list(self.always)
+        node = self.trie
+        found.extend(node.get(None, ()))
+        for segment in segments:
+            node = node.get(segment)
+            if node is None:
+                break
+            found.extend(node.get(None, ()))
+        if self.by_name:
+            last = len(segments) - 1
+            for depth, segment in enumerate(segments):
+                for i, dir_only in self.by_name.get(segment, ()):
+                    if depth < last or not dir_only:
+                        found.append(i)
+        if self.by_suffix:
+            base = segments[-1]
+            for k in range(len(base) + 1):
+                found.extend(self.by_suffix.get(base[k:], ()))
+        return found
+
+    def owning_rule(self, path):
+        """Index of the rule that owns 'path' (last match wins), or None."""
+        path = path.lstrip("/")
+        for i in sorted(self.candidates(path), reverse=True):
+            if self.regexes[i](path):
+                return i
+        return None
+
+    def owners_for(self, path):
+        """Owners required for 'path'."""
+        i = self.owning_rule(path)
+        return () if i is None else self.table.owners_of(i)
+
+    def required_owners(self, paths):
+        """Union of the owners required across 'paths' (e.g. every file a PR changes)."""
+        ids = set()
+        for path in paths:
+            i = self.owning_rule(path)
+            if i is not None:
+                ids.update(self.table.owner_ids_of(i))
+        return {self.table.owners[oid] for oid in ids}
+
+def parse_codeowners(text):
+    """
+    Parse CODEOWNERS text into a RuleTable. 'text' is str, bytes, or an iterable of bytes
+    chunks that each end on a line boundary (the file is then never held whole).
+    """
+    table = RuleTable()
+    section = 0
+    valid = set()   # owners already checked; monorepo files repeat the same few thousand
+    for lineno, raw in enumerate(iter_lines(text), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = SECTION_RE.match(line)
+        if m:
+            table.sections.append(m.group(1).strip())
+            section = len(table.sections) - 1
+            continue
+        tokens = split_line(line)
+        if not tokens:
+            continue
+        pattern, owners = tokens[0], tokens[1:]
+        if line.startswith("!"):
+            table.errors.append((lineno, "negation patterns are not supported"))
+            continue
+        if "[" in pattern and has_unescaped(pattern, "["):
+            table.errors.append((lineno, "character ranges are not supported"))
+            continue
+        bad = [o for o in owners if o not in valid and owner_kind(o) is None]
+        if bad:
+            table.errors.append((lineno, f"invalid owner {bad[0]!r}"))
+            continue
+        valid.update(owners)
+        table.add_rule(pattern, owners, lineno, section)
+    return table
+
+def iter_lines(text):
+    """Lines of str, bytes or line-aligned bytes chunks, split as str.splitlines() would."""
+    if isinstance(text, (str, bytes)):
+        text = (text,)
+    for chunk in text:
+        if isinstance(chunk, bytes):
+            # Chunks end on b"\n", which never falls inside a multi-byte UTF-8 sequence
+            chunk = chunk.decode("utf-8", errors="ignore")
+        yield from chunk.splitlines()
+
+# ---------- Metrics ----------
+def owner_metrics(table, paths=None):
+    """
+    Ownership metrics of a parsed file, in one pass over its rules:
+      owners_users / owners_teams   distinct individual (@user or email) / @org/team owners
+      rules_count                   rules in effect
+      owners_per_rule_median / _max over all rules (owner-less rules count as 0; None
+                                    if there are no rules)
+      catchall_coverage             share of 'paths' (the repo's files) owned through a
+                                    catch-all rule such as '*'; 0.0 if there is none,
+                                    None if it has one but no file list was given
+    """
+    per_rule, used, catch_all = [], set(), set()
+    for i in range(len(table)):
+        ids = table.owner_ids_of(i)
+        per_rule.append(len(ids))
+        used.update(ids)
+        if table.patterns[i] in CATCH_ALL_PATTERNS:
+            catch_all.add(i)
+    kinds = [owner_kind(table.owners[oid]) for oid in used]
+    if not catch_all:
+        coverage = 0.0
+    elif paths is None:
+        coverage = None
+    else:
+        matcher = table.matcher()
+        total = covered = 0
+        for path in paths:
+            total += 1
+            covered += matcher.owning_rule(path) in catch_all
+        coverage = round(covered / total, 4) if total else None
+    return {
+        "owners_users": sum(1 for k in kinds if k != OWNER_TEAM),
+        "owners_teams": kinds.count(OWNER_TEAM),
+        "rules_count": len(per_rule),
+        "owners_per_rule_median": float(statistics.median(per_rule)) if per_rule else None,
+        "owners_per_rule_max": max(per_rule) if per_rule else None,
+        "catchall_coverage": coverage,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Print a CODEOWNERS rule table, or the owners of given paths.")
+    ap.add_argument("codeowners", help="Path to a CODEOWNERS file")
+    ap.add_argument("--paths", default=None, metavar="FILE",
+                    help="Resolve the owners of each path in FILE (one per line, '-' for stdin)")
+    args = ap.parse_args()
+    with open(args.codeowners, "rb") as f:
+        table = parse_codeowners(f.read())
+    for line, msg in table.errors:
+        print(f"line {line}: {msg}", file=sys.stderr)
+    if args.paths is None:
+        for rule in table:
+            print(f"{rule.line}\t{rule.section}\t{rule.pattern}\t{' '.join(rule.owners)}")
+        return
+    matcher = table.matcher()
+    f = sys.stdin if args.paths == "-" else open(args.paths, encoding="utf-8")
+    try:
+        for path in f:
+            path = path.rstrip("\n")
+            if path:
+                print(f"{path}\t{' '.join(matcher.owners_for(path))}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+if __name__ == "__main__":
+    main()
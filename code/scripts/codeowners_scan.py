@@ -5,115 +5,563 @@ Scan a list of GitHub repos for CODEOWNERS presence, adoption date, and owners c
 
 Input CSV (default: active_repos.csv) must contain a 'repo_name' column (e.g., owner/repo).
 Output CSV (default: codeowners_meta.csv) columns:
-  repo_name,has_codeowners,codeowners_created_at,owners_count
+  repo_name,has_codeowners,codeowners_created_at,owners_count,
+  owners_users,owners_teams,rules_count,owners_per_rule_median,owners_per_rule_max,
+  catchall_coverage,status,error
+The owner metrics come from codeowners_rules.owner_metrics(); catchall_coverage needs the
+repo's file list, so it is only filled in by --git-root scans (or is 0.0 with no catch-all rule).
+Repos whose scan failed get status=error (and empty results) and can be re-run with --retry-failed.
 
 Env:
-  GITHUB_TOKEN  Personal access token with at least public_repo scope.
+  GITHUB_TOKEN        Personal access token with at least public_repo scope.
+  GITHUB_TOKENS       Optional pool of tokens (comma/space separated); each request goes
+                      to the token with the most rate-limit headroom.
+  GITHUB_TOKENS_FILE  Optional file with one token per line (added to the pool).
 
 Usage examples:
   python codeowners_scan.py active_repos.csv codeowners_meta.csv
   python codeowners_scan.py active_repos_top2000.csv codeowners_meta.csv --limit 2000
+  python codeowners_scan.py active_repos.csv codeowners_meta.csv --workers 16
+  python codeowners_scan.py active_repos.csv codeowners_meta.csv --async --concurrency 200
+  python codeowners_scan.py active_repos_top2000.csv codeowners_meta.csv --detect graphql --batch-size 50
+  python codeowners_scan.py active_repos_top2000.csv codeowners_meta.csv --cache gh_cache.sqlite
+  python codeowners_scan.py active_repos.csv codeowners_meta.csv --timeout 60 --retries 5
+  python codeowners_scan.py active_repos_top2000.csv codeowners_meta.csv --git-root /srv/mirrors
+  python codeowners_scan.py active_repos.csv codeowners_meta.csv --shard 0/4      # one per box/token
+  some_upstream_job | python codeowners_scan.py - codeowners_meta.csv
+  python codeowners_scan.py merge codeowners_meta.csv codeowners_meta.shard-*-of-4.csv --input active_repos.csv
+
+Library use: GitHubClient(tokens=..., pool_maxsize=..., timeout=..., retries=..., cache=...)
+owns the sessions and rate-limit state; set_client() makes scan_repos() use it.
 """
 
 import os
 import sys
 import time
-import base64
+import binascii
 import re
 import csv
 import argparse
-from datetime import timezone
-from dateutil import parser as dtparse
-import requests
-import pandas as pd
-from tqdm import tqdm
+import itertools
+import json
+import sqlite3
+import zlib
+import subprocess
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from codeowners_rules import parse_codeowners, owner_metrics, CATCH_ALL_PATTERNS
+
+# requests, pandas, tqdm and asyncio are imported where first needed: --help, library use and
+# --git-root runs never pay for them, and no token is read until an API call is made.
 
 # ---------- Config ----------
 DEFAULT_IN  = "active_repos.csv"
 DEFAULT_OUT = "codeowners_meta.csv"
+OUTPUT_FIELDS = ["repo_name", "has_codeowners", "codeowners_created_at", "owners_count",
+                 "owners_users", "owners_teams", "rules_count", "owners_per_rule_median",
+                 "owners_per_rule_max", "catchall_coverage", "status", "error"]
+METRIC_FIELDS = {"owners_users": int, "owners_teams": int, "rules_count": int,
+                 "owners_per_rule_median": float, "owners_per_rule_max": int, "catchall_coverage": float}
+RETRY_WORKERS = 2         # --retry-failed pass: gentler concurrency ...
+RETRY_BACKOFF_S = 10      # ... and a longer initial backoff than a normal scan
 CODEOWNERS_PATHS = ["CODEOWNERS", ".github/CODEOWNERS", "docs/CODEOWNERS"]
 HANDLE_RE = re.compile(r'@([A-Za-z0-9](?:[A-Za-z0-9-]{0,38})(?:/[A-Za-z0-9_.-]+)?)')
+# Owner counting: handle-shaped tokens are collected with a cheap literal-'@' scan and
+# only the distinct ones are normalised through HANDLE_RE; whole-line comments are cut first
+HANDLE_TOKEN_RE = re.compile(rb'@([A-Za-z0-9][-\w./]*)')
+HANDLE_RE_B = re.compile(HANDLE_RE.pattern.encode())
+COMMENT_LINE_RE = re.compile(rb'\n[ \t]*#[^\n]*')
+# ASCII bytes str.splitlines()/str.strip() treat as line breaks or whitespace besides \n, space and tab
+LINE_SPECIAL_BYTES = (b"\r", b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f")
+DECODE_CHUNK = 1 << 20    # base64 characters decoded per step when streaming file content
 TIMEOUT_S = 30
 RETRIES   = 3
 BACKOFF_S = 2
+POOL_MAXSIZE = 10         # connections per host per token session (raised to --workers)
+POOL_HOSTS = 4            # distinct hosts whose connection pools are kept alive
+INFLIGHT_PER_WORKER = 4   # bound on queued repos per worker in --workers mode
+ASYNC_CONCURRENCY = 100   # in-flight requests for the --async backend
+RATE_RESERVE = 50         # requests per window the pacer leaves unspent as headroom
+RATE_PACE_BELOW = 500     # budget left above headroom at which bursting stops and pacing starts
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH = 50        # repos aliased into one GraphQL query in --detect graphql mode
+NEGATIVE_TTL_DAYS = 7     # how long a cached CODEOWNERS 404 is trusted (while HEAD is unchanged)
+
+# ---------- Rate limiting ----------
+class RateLimiter:
+    """
+    Token bucket for the primary rate limit, shared by every worker/coroutine.
+    The bucket is refilled from X-RateLimit-Remaining/-Reset on each response. Its burst
+    capacity is the budget above headroom + pace_below: those requests go out at once.
+    Only the last pace_below tokens are handed out evenly over what is left of the
+    window, so we slow down ahead of the limit instead of reacting to 403s.
+    """
+
+    def __init__(self, headroom=RATE_RESERVE, pace_below=RATE_PACE_BELOW):
+        self.lock = threading.Lock()
+        self.headroom = headroom
+        self.pace_below = pace_below
+        self.remaining = None   # unknown until the first response of a window
+        self.reset = 0.0
+        self.next_at = 0.0
+        self.held_until = 0.0   # end of the last pause(); refunds never cut into it
+
+    def update(self, headers):
+        """Sync the bucket with the rate-limit headers of a response."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining, reset = int(remaining), float(reset)
+        with self.lock:
+            if self.remaining is None or reset != self.reset:
+                self.remaining, self.reset = remaining, reset
+            else:
+                # Same window: our local count already includes calls still in flight
+                self.remaining = min(self.remaining, remaining)
+
+    def reserve(self):
+        """Take one token; return how many seconds to wait before sending the request."""
+        with self.lock:
+            now = time.time()
+            if self.remaining is not None and now >= self.reset:
+                self.remaining = None   # window rolled over; relearn from the next response
+            start = max(now, self.next_at)
+            if self.remaining is None:
+                return start - now
+
+            budget = self.remaining - self.headroom
+            if budget <= 0:
+                start = max(start, self.reset + 1)
+                self.next_at = start
+                return start - now
+
+            self.remaining -= 1
+            if budget > self.pace_below:
+                return start - now   # burst: the budget comfortably covers the window
+            self.next_at = start + max(0.0, self.reset - start) / budget
+            return start - now
+
+    def available(self):
+        """Requests left in the current window after headroom (inf while unknown)."""
+        with self.lock:
+            if self.remaining is None or time.time() >= self.reset:
+                return float("inf")
+            return self.remaining - self.headroom
+
+    def refund(self):
+        """
+        Give back a token for a response that did not count (304 Not Modified), and
+        the pacing slot reserve() took for it, so cached reruns are not slowed down.
+        """
+        with self.lock:
+            if self.remaining is None:
+                return
+            self.remaining += 1
+            budget = self.remaining - self.headroom
+            if 0 < budget <= self.pace_below:
+                now = time.time()
+                step = max(0.0, self.reset - now) / budget
+                self.next_at = max(now, self.held_until, self.next_at - step)
+
+    def pause(self, seconds):
+        """Hold every caller back for 'seconds' (e.g. after a secondary-limit Retry-After)."""
+        with self.lock:
+            self.held_until = max(self.held_until, time.time() + seconds)
+            self.next_at = max(self.next_at, self.held_until)
 
 # ---------- Session / Auth ----------
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    print("ERROR: Set GITHUB_TOKEN environment variable (classic token with public_repo).", file=sys.stderr)
-    sys.exit(1)
-
-SESSION = requests.Session()
-SESSION.headers.update({
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
+API_HEADERS = {
     "Accept": "application/vnd.github+json",
     "X-GitHub-Api-Version": "2022-11-28",
     "User-Agent": "codeowners-scan-msr2026/1.1"
-})
+}
+
+class TokenSlot:
+    """One token with its own session and its own rate-limit budget."""
+
+    def __init__(self, token, session):
+        self.auth = f"Bearer {token}"
+        self.label = f"…{token[-4:]}"
+        self.session = session
+        self.session.headers.update({"Authorization": self.auth, **API_HEADERS})
+        # REST ("core") and GraphQL budgets are separate on GitHub's side
+        self.limiters = {"core": RateLimiter(), "graphql": RateLimiter()}
+
+def load_tokens():
+    """Tokens from GITHUB_TOKENS (comma/space separated), GITHUB_TOKENS_FILE (one per line) or GITHUB_TOKEN."""
+    tokens = re.split(r"[\s,]+", os.getenv("GITHUB_TOKENS", "").strip())
+    tokens_file = os.getenv("GITHUB_TOKENS_FILE")
+    if tokens_file:
+        with open(tokens_file, encoding="utf-8") as f:
+            tokens += [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    if os.getenv("GITHUB_TOKEN"):
+        tokens.append(os.getenv("GITHUB_TOKEN"))
+    return list(dict.fromkeys(t for t in tokens if t))   # dedupe, keep order
+
+
+# ---------- Response cache ----------
+CACHED_HEADERS = ("Content-Type", "Link", "ETag", "Last-Modified")
+
+class ResponseCache:
+    """
+    On-disk (SQLite) cache of GET responses keyed by URL + params.
+    Stored ETag/Last-Modified validators turn re-fetches into conditional requests;
+    GitHub answers unchanged resources with 304, which is free against the primary limit.
+    """
+
+    def __init__(self, path, negative_ttl_days=NEGATIVE_TTL_DAYS):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS absent ("
+            " repo TEXT, path TEXT, head_sha TEXT, checked_at REAL, PRIMARY KEY (repo, path))"
+        )
+        self.db.commit()
+        self.negative_ttl_s = negative_ttl_days * 86400
+
+    @staticmethod
+    def key(url, params=None):
+        return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+    def get(self, key):
+        """Cached entry as a dict, or None."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, headers, body, etag, last_modified FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, etag, last_modified = row
+        return {"status": status, "headers": json.loads(headers), "body": body,
+                "etag": etag, "last_modified": last_modified}
+
+    def put(self, key, status, headers, body):
+        """Store a 200 response if it carries a validator."""
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if status != 200 or not (etag or last_modified):
+            return
+        kept = {h: headers[h] for h in CACHED_HEADERS if h in headers}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(kept), body, etag, last_modified, time.time()),
+            )
+            self.db.commit()
+
+    def is_absent(self, repo, path, head_sha):
+        """True if 'path' was a 404 in 'repo' at commit 'head_sha' within the negative TTL."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT head_sha, checked_at FROM absent WHERE repo = ? AND path = ?", (repo, path)
+            ).fetchone()
+        return (row is not None and row[0] == head_sha
+                and time.time() - row[1] < self.negative_ttl_s)
+
+    def mark_absent(self, repo, path, head_sha):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO absent VALUES (?, ?, ?, ?)",
+                            (repo, path, head_sha, time.time()))
+            self.db.commit()
+
+    @staticmethod
+    def validators(entry):
+        """Conditional-request headers for a cached entry."""
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def to_response(entry, url):
+        """Rebuild a requests.Response from a cached entry."""
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        r = requests.Response()
+        r.status_code = entry["status"]
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r._content = entry["body"]
+        r.url = url
+        r.encoding = "utf-8"
+        return r
+
+    def close(self):
+        with self.lock:
+            self.db.close()
 
 # ---------- HTTP helpers ----------
-def gh_get(url, params=None, ok404=False, retries=RETRIES):
-    """GET with primary/secondary rate-limit handling + retries/backoff."""
-    backoff = BACKOFF_S
-    for attempt in range(retries + 1):
+def rate_limit_sleep(status_code, headers, backoff, label=""):
+    """Seconds to sleep if the response hit a primary/secondary rate limit, else None.
+    label names the token in the log line (several tokens may be in rotation)."""
+    # Primary rate limit
+    if status_code == 403 and headers.get("X-RateLimit-Remaining") == "0":
+        reset = int(headers.get("X-RateLimit-Reset", "0") or 0)
+        sleep_s = max(0, reset - int(time.time()) + 2)
+        print(f"[rate-limit] Primary limit hit on token {label}. Sleeping {sleep_s}s …", file=sys.stderr)
+        return sleep_s
+
+    # Secondary/abuse or transient throttling
+    if status_code in (403, 429) and headers.get("Retry-After"):
         try:
-            r = SESSION.get(url, params=params, timeout=TIMEOUT_S)
-        except requests.RequestException as e:
-            if attempt < retries:
-                time.sleep(backoff); backoff *= 2; continue
-            raise
+            retry_after = int(headers["Retry-After"])
+        except ValueError:
+            retry_after = backoff
+        print(f"[rate-limit] Secondary limit on token {label}. Retry-After {retry_after}s …", file=sys.stderr)
+        return retry_after
+    return None
 
-        # Primary rate limit
-        if r.status_code == 403 and r.headers.get("X-RateLimit-Remaining") == "0":
-            reset = int(r.headers.get("X-RateLimit-Reset", "0") or 0)
-            sleep_s = max(0, reset - int(time.time()) + 2)
-            print(f"[rate-limit] Primary limit hit. Sleeping {sleep_s}s …", file=sys.stderr)
-            time.sleep(sleep_s)
-            continue
+# classify_response() outcomes
+CACHED, THROTTLED, RETRY, ABSENT, OK = "cached", "throttled", "retry", "absent", "ok"
+
+def classify_response(status_code, headers, cached, ok404, backoff, label=""):
+    """
+    Decide what a request loop does with a response; shared by the requests and httpx
+    transports so both handle every status the same way. Returns (outcome, sleep_s):
+      CACHED     304 for a cached copy: serve the cache (304s are not charged)
+      THROTTLED  primary/secondary rate limit: pause the token for sleep_s, then retry
+      RETRY      5xx or other error: back off and retry, or raise once retries run out
+      ABSENT     404, or 409 (git data of an empty repository), with ok404: return None
+      OK         success
+    """
+    if status_code == 304 and cached:
+        return CACHED, None
+    sleep_s = rate_limit_sleep(status_code, headers, backoff, label)
+    if sleep_s is not None:
+        return THROTTLED, sleep_s
+    if status_code in (500, 502, 503, 504):
+        return RETRY, None
+    if ok404 and status_code in (404, 409):
+        return ABSENT, None
+    if status_code >= 400:
+        return RETRY, None
+    return OK, None
 
-        # Secondary/abuse or transient throttling
-        if r.status_code in (403, 429) and r.headers.get("Retry-After"):
+class GitHubClient:
+    """
+    GitHub API client: one keep-alive session and rate-limit budget per token, an optional
+    ResponseCache, and the timeout/retry policy. Holds no module state, so several clients
+    (or an embedding service) can coexist; the scanner's helpers go through get_client().
+    """
+
+    def __init__(self, tokens=None, pool_maxsize=POOL_MAXSIZE, pool_connections=POOL_HOSTS,
+                 timeout=TIMEOUT_S, retries=RETRIES, backoff=BACKOFF_S, cache=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        tokens = load_tokens() if tokens is None else list(tokens)
+        if not tokens:
+            raise RuntimeError("Set GITHUB_TOKEN (or GITHUB_TOKENS / GITHUB_TOKENS_FILE) environment "
+                               "variable (classic token with public_repo).")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.slots = []
+        for token in tokens:
+            session = requests.Session()
+            # pool_block: at most pool_maxsize live connections per host; extra callers wait
+            # for a free keep-alive connection instead of opening throwaway ones
+            session.mount("https://", HTTPAdapter(pool_connections=pool_connections,
+                                                  pool_maxsize=pool_maxsize, pool_block=True))
+            self.slots.append(TokenSlot(token, session))
+
+    def pick(self, resource="core"):
+        """Slot with the largest remaining 'resource' budget; if all are spent, the one resetting first."""
+        best = max(self.slots, key=lambda slot: slot.limiters[resource].available())
+        if best.limiters[resource].available() > 0:
+            return best
+        return min(self.slots, key=lambda slot: slot.limiters[resource].reset)
+
+    def get(self, url, params=None, ok404=False, retries=None):
+        """GET with primary/secondary rate-limit handling + retries/backoff."""
+        return self.request("GET", url, params=params, ok404=ok404, retries=retries)
+
+    def request(self, method, url, params=None, json_body=None, ok404=False, retries=None, resource="core"):
+        """Request with primary/secondary rate-limit handling + retries/backoff (GETs go through the cache)."""
+        import requests
+        retries = self.retries if retries is None else retries
+        cache = self.cache if method == "GET" else None
+        key = entry = None
+        if cache is not None:
+            key = cache.key(url, params)
+            entry = cache.get(key)
+
+        backoff = self.backoff
+        for attempt in range(retries + 1):
+            slot = self.pick(resource)
+            limiter = slot.limiters[resource]
+            time.sleep(limiter.reserve())
             try:
-                retry_after = int(r.headers["Retry-After"])
-            except ValueError:
-                retry_after = backoff
-            print(f"[rate-limit] Secondary limit. Retry-After {retry_after}s …", file=sys.stderr)
-            time.sleep(retry_after)
-            continue
+                r = slot.session.request(method, url, params=params, json=json_body,
+                                         headers=ResponseCache.validators(entry), timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt < retries:
+                    time.sleep(backoff); backoff *= 2; continue
+                raise
+            limiter.update(r.headers)
 
-        # Transient server errors
-        if r.status_code in (500, 502, 503, 504):
-            if attempt < retries:
-                time.sleep(backoff); backoff *= 2; continue
+            outcome, sleep_s = classify_response(r.status_code, r.headers, entry is not None, ok404, backoff,
+                                                 slot.label)
+            if outcome == CACHED:
+                limiter.refund()
+                return ResponseCache.to_response(entry, r.url)
+            if outcome == THROTTLED:
+                # Pause every worker on this token, not just this one
+                limiter.pause(sleep_s)
+                continue
+            if outcome == ABSENT:
+                return None
+            if outcome == RETRY:
+                if attempt < retries:
+                    time.sleep(backoff); backoff *= 2; continue
+                r.raise_for_status()
+            if key:
+                cache.put(key, r.status_code, r.headers, r.content)
+            return r
 
-        if ok404 and r.status_code == 404:
-            return None
+        raise RuntimeError(f"Failed after retries: {url}")
 
-        # Raise for other errors
-        try:
-            r.raise_for_status()
-        except requests.HTTPError:
-            if attempt < retries:
-                time.sleep(backoff); backoff *= 2; continue
-            raise
-        return r
+    def graphql(self, query, variables=None, retries=None):
+        """
+        POST a GraphQL query; return (data, errors).
+        Per-alias errors (e.g. a deleted repo) come back alongside partial data and are
+        left to the caller; a RATE_LIMITED response waits for the reset and retries.
+        """
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            r = self.request("POST", GRAPHQL_URL, json_body={"query": query, "variables": variables or {}},
+                             retries=retries, resource="graphql")
+            j = r.json()
+            errors = j.get("errors") or []
+            if any(e.get("type") == "RATE_LIMITED" for e in errors) and attempt < retries:
+                reset = int(r.headers.get("X-RateLimit-Reset", "0") or 0)
+                sleep_s = max(0, reset - int(time.time()) + 2)
+                print(f"[rate-limit] GraphQL limit hit. Sleeping {sleep_s}s …", file=sys.stderr)
+                time.sleep(sleep_s)
+                continue
+            return j.get("data") or {}, errors
+        raise RuntimeError("GraphQL query failed after retries")
 
-    raise RuntimeError(f"Failed after retries: {url}")
+    def close(self):
+        for slot in self.slots:
+            slot.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client():
+    """Client used by the module-level helpers; built from the environment on first use."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = GitHubClient()
+        return _CLIENT
+
+def set_client(client):
+    """Install 'client' for the module-level helpers."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        _CLIENT = client
+
+def gh_get(url, params=None, ok404=False, retries=None):
+    """GET through the default client."""
+    return get_client().get(url, params=params, ok404=ok404, retries=retries)
+
+def gh_graphql(query, variables=None, retries=None):
+    """GraphQL query through the default client; returns (data, errors)."""
+    return get_client().graphql(query, variables, retries=retries)
 
 # ---------- CODEOWNERS logic ----------
 def find_codeowners_location(repo_full):
-    """Return (path, content_base64) if found, else (None, None)."""
+    """
+    Return (path, content_base64) if found, else (None, None).
+    With the negative cache on, paths that 404'd at the current HEAD are not re-probed.
+    """
     owner, repo = repo_full.split("/", 1)
+    cache = get_client().cache
+    head = default_head_sha(repo_full) if negative_cache_enabled(cache) else None
     for path in CODEOWNERS_PATHS:
+        if head and cache.is_absent(repo_full, path, head):
+            continue
         url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
         r = gh_get(url, ok404=True)
         if r is None:
+            if head:
+                cache.mark_absent(repo_full, path, head)
             continue
-        j = r.json()
-        if isinstance(j, dict) and j.get("type") == "file":
-            return path, j.get("content", "")
+        content = contents_file_b64(r.json())
+        if content is not None:
+            return path, content
     return None, None
 
+def negative_cache_enabled(cache):
+    return cache is not None and cache.negative_ttl_s > 0
+
+def default_head_sha(repo_full):
+    """
+    SHA of the default branch head (None for an empty repo).
+    Goes through the response cache, so an unchanged head costs a free 304.
+    """
+    owner, repo = repo_full.split("/", 1)
+    r = gh_get(f"https://api.github.com/repos/{owner}/{repo}/commits", params={"per_page": 1}, ok404=True)
+    commits = r.json() if r is not None else None
+    return commits[0]["sha"] if commits else None
+
+def find_codeowners_location_tree(repo_full):
+    """
+    Tree-listing variant of find_codeowners_location(): list the root tree once, descend
+    only into directories that exist on the way to a candidate path, and fetch just the
+    blob that was found. Cost is the root tree, plus one listing per candidate directory
+    that actually exists, plus the one blob -- not one call per entry in CODEOWNERS_PATHS.
+    """
+    owner, repo = repo_full.split("/", 1)
+    base = f"https://api.github.com/repos/{owner}/{repo}/git"
+    root = gh_get(f"{base}/trees/HEAD", ok404=True)
+    if root is None:
+        return None, None
+    listings = {"": tree_entries(root.json())}
+
+    for path in CODEOWNERS_PATHS:
+        *dirs, name = path.split("/")
+        entries, prefix = listings[""], ""
+        for d in dirs:
+            entry = entries.get(d)
+            if entry is None or entry.get("type") != "tree":
+                entries = None
+                break
+            prefix = f"{prefix}{d}/"
+            if prefix not in listings:
+                listings[prefix] = tree_entries(gh_get(f"{base}/trees/{entry['sha']}").json())
+            entries = listings[prefix]
+        entry = entries.get(name) if entries else None
+        if entry is not None and entry.get("type") == "blob":
+            return path, gh_get(f"{base}/blobs/{entry['sha']}").json().get("content", "")
+    return None, None
+
+def tree_entries(j):
+    """Map name -> entry for a git/trees API response."""
+    return {e["path"]: e for e in j.get("tree", [])}
+
+def contents_file_b64(j):
+    """Base64 content of a contents-API response if it is a file, else None."""
+    if isinstance(j, dict) and j.get("type") == "file":
+        return j.get("content", "")
+    return None
+
 def earliest_commit_date_for_path(repo_full, path):
     """
     Find the oldest commit date touching 'path' in repo.
@@ -128,118 +576,909 @@ def earliest_commit_date_for_path(repo_full, path):
     if r.status_code == 200 and not r.json():
         return None
 
-    link = r.headers.get("Link", "")
-    last_url = None
-    if link:
-        for part in link.split(","):
-            segs = [s.strip() for s in part.split(";")]
-            if len(segs) >= 2 and segs[1] == 'rel="last"':
-                last_url = segs[0].lstrip("<").rstrip(">")
-                break
-
+    last_url = link_last_url(r.headers.get("Link", ""))
     if last_url:
         commits = gh_get(last_url).json()
     else:
         commits = r.json()
+    return oldest_commit_date(commits)
+
+def link_last_url(link):
+    """Return the rel="last" URL from a Link header, or None."""
+    if link:
+        for part in link.split(","):
+            segs = [s.strip() for s in part.split(";")]
+            if len(segs) >= 2 and segs[1] == 'rel="last"':
+                return segs[0].lstrip("<").rstrip(">")
+    return None
 
+def oldest_commit_date(commits):
+    """Author date of the last entry in a commits page, as UTC datetime (or None)."""
     if not commits:
         return None
 
     oldest = commits[-1]  # with per_page=1 on last page, that's the oldest
-    date_str = oldest["commit"]["author"]["date"]
-    return dtparse.parse(date_str).astimezone(timezone.utc)
+    return parse_commit_date(oldest["commit"]["author"]["date"])
+
+def parse_commit_date(date_str):
+    """Parse an API timestamp into a UTC datetime."""
+    dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    return dt.astimezone(timezone.utc)
 
-def count_unique_owners_from_content_b64(content_b64):
-    """Count distinct @handles in CODEOWNERS file content."""
+def iter_content_b64(content_b64, chunk=DECODE_CHUNK):
+    """
+    Decode contents-API base64 incrementally, yielding bytes chunks that end on a line
+    boundary, so multi-MB files are never held decoded (or as text) all at once.
+    Raises binascii.Error on malformed input.
+    """
     if not content_b64:
-        return 0
+        return
+    pending, tail = "", b""
+    for start in range(0, len(content_b64), chunk):
+        # GitHub wraps the payload at 60 columns; decode whole 4-char groups only
+        pending += content_b64[start:start + chunk].replace("\n", "")
+        cut = len(pending) - len(pending) % 4
+        data = tail + binascii.a2b_base64(pending[:cut])
+        pending = pending[cut:]
+        nl = data.rfind(b"\n") + 1
+        if nl:
+            yield data[:nl]
+        tail = data[nl:]
+    if pending:
+        tail += binascii.a2b_base64(pending)
+    if tail:
+        yield tail
+
+class OwnerCounter:
+    """
+    Distinct @handles on the non-comment lines of CODEOWNERS content, fed as bytes chunks
+    that end on line boundaries. Plain ASCII chunks (lines split on b"\n" only) are
+    tokenized in bulk; a chunk with any other line break, control whitespace or non-ASCII
+    byte goes line by line through str.splitlines(), so the count always equals the
+    per-line HANDLE_RE count over the decoded text.
+    """
+
+    def __init__(self):
+        self.tokens = set()
+
+    def feed(self, data):
+        if not data.isascii() or any(b in data for b in LINE_SPECIAL_BYTES):
+            for line in data.decode("utf-8", errors="ignore").splitlines():
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    self.tokens.update(h.encode() for h in HANDLE_RE.findall(line))
+            return
+        if b"#" in data:
+            data = COMMENT_LINE_RE.sub(b"\n", b"\n" + data)   # chunks start on a line boundary
+        self.tokens.update(HANDLE_TOKEN_RE.findall(data))
+
+    def count(self):
+        # A token is a superset of its handle (e.g. past 39 characters); trim it the way HANDLE_RE would
+        return len({HANDLE_RE_B.match(b"@" + token).group(1).lower() for token in self.tokens})
+
+# ---------- GraphQL batch mode ----------
+def aliased_repo_query(repos, body, **per_repo):
+    """
+    Build a query with one 'r{i}: repository(...) { body }' alias per repo.
+    'body' may use per-repo variables as $<name>{i}; per_repo maps name -> (type, values).
+    """
+    var_defs, fields, variables = [], [], {}
+    for i, repo_full in enumerate(repos):
+        owner, name = repo_full.split("/", 1)
+        variables[f"o{i}"], variables[f"n{i}"] = owner, name
+        var_defs.append(f"$o{i}: String!, $n{i}: String!")
+        for key, (gql_type, values) in per_repo.items():
+            variables[f"{key}{i}"] = values[i]
+            var_defs.append(f"${key}{i}: {gql_type}")
+        fields.append(f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{\n{body.replace('{i}', str(i))}\n  }}")
+    query = "query(" + ", ".join(var_defs) + ") {\n" + "\n".join(fields) + "\n}"
+    return query, variables
+
+def codeowners_batch_query(repos):
+    """Build one query aliasing every repo in 'repos' and all CODEOWNERS_PATHS blobs."""
+    blobs = "\n".join(
+        f"    f{j}: object(expression: {json.dumps('HEAD:' + path)}) {{ ... on Blob {{ text isTruncated isBinary }} }}"
+        for j, path in enumerate(CODEOWNERS_PATHS)
+    )
+    return aliased_repo_query(repos, blobs)
+
+def find_codeowners_locations_graphql(repos):
+    """
+    Batched find_codeowners_location(): one GraphQL call for all 'repos'.
+    Returns (found, failed): found is {repo: (path, content)} with (None, None) where no
+    CODEOWNERS file exists; failed is {repo: exception} for aliases the query errored on.
+    NOT_FOUND (deleted or private repo) counts as no CODEOWNERS, like a REST 404.
+    Truncated or binary blobs are re-fetched through the contents API (base64 chunks).
+    """
+    query, variables = codeowners_batch_query(repos)
+    data, errors = gh_graphql(query, variables)
+    if errors and not data:
+        raise RuntimeError(f"GraphQL error: {errors[0].get('message', errors[0])}")
+
+    aliases = {f"r{i}": repo for i, repo in enumerate(repos)}
+    failed, not_found = {}, set()
+    for e in errors:
+        repo = aliases.get((e.get("path") or [None])[0])
+        if repo is None:
+            continue
+        if e.get("type") == "NOT_FOUND":
+            not_found.add(repo)
+        else:
+            failed.setdefault(repo, RuntimeError(f"GraphQL {e.get('type') or 'error'}: {e.get('message', '')}"))
+
+    found = {}
+    for alias, repo in aliases.items():
+        if repo in failed:
+            continue
+        node = data.get(alias)
+        if node is None and repo not in not_found:
+            failed[repo] = RuntimeError("GraphQL returned no data for this repository")
+            continue
+        found[repo] = (None, None)
+        for j, path in enumerate(CODEOWNERS_PATHS):
+            blob = (node or {}).get(f"f{j}")
+            if not blob or "text" not in blob:   # {} means the path is a tree, not a file
+                continue
+            if blob.get("isTruncated") or blob.get("isBinary") or blob["text"] is None:
+                try:
+                    found[repo] = fetch_codeowners_b64(repo, path)
+                except Exception as e:
+                    failed[repo] = e
+                    del found[repo]
+            else:
+                found[repo] = (path, blob["text"])
+            break
+    return found, failed
+
+def fetch_codeowners_b64(repo_full, path):
+    """(path, base64 chunks) from the contents API, for blobs GraphQL returns without text."""
+    owner, repo = repo_full.split("/", 1)
+    r = gh_get(f"https://api.github.com/repos/{owner}/{repo}/contents/{path}", ok404=True)
+    content = contents_file_b64(r.json()) if r is not None else None
+    if content is None:
+        return None, None
+    return path, iter_content_b64(content)
+
+HISTORY_HEAD_BODY = """    defaultBranchRef { target { ... on Commit {
+      oid
+      history(path: $p{i}, first: 1) { totalCount nodes { authoredDate } }
+    } } }"""
+
+HISTORY_OLDEST_BODY = """    object(oid: $s{i}) { ... on Commit {
+      history(path: $p{i}, first: 1, after: $c{i}) { nodes { authoredDate } }
+    } }"""
+
+def earliest_commit_dates_graphql(paths):
+    """
+    Batched earliest_commit_date_for_path() for {repo: path}.
+    One query reads each path's history totalCount (and newest commit) on the default
+    branch; a second jumps every multi-commit history to its oldest entry with an
+    "<oid> <offset>" cursor. Returns {repo: datetime or None}; repos the queries could
+    not resolve are left out so the caller can fall back to REST.
+    """
+    repos = list(paths)
+    query, variables = aliased_repo_query(repos, HISTORY_HEAD_BODY,
+                                          p=("String!", [paths[r] for r in repos]))
+    data, _ = gh_graphql(query, variables)
+
+    dates, deep = {}, {}
+    for i, repo in enumerate(repos):
+        target = (((data.get(f"r{i}") or {}).get("defaultBranchRef") or {}).get("target") or {})
+        history = target.get("history")
+        if not history:
+            continue
+        total = history.get("totalCount") or 0
+        if total == 0:
+            dates[repo] = None
+        elif total == 1:
+            dates[repo] = parse_commit_date(history["nodes"][0]["authoredDate"])
+        else:
+            deep[repo] = (target["oid"], f"{target['oid']} {total - 2}")
+
+    if deep:
+        repos = list(deep)
+        query, variables = aliased_repo_query(
+            repos, HISTORY_OLDEST_BODY,
+            p=("String!", [paths[r] for r in repos]),
+            s=("GitObjectID!", [deep[r][0] for r in repos]),
+            c=("String!", [deep[r][1] for r in repos]),
+        )
+        data, _ = gh_graphql(query, variables)
+        for i, repo in enumerate(repos):
+            obj = (data.get(f"r{i}") or {}).get("object") or {}
+            nodes = (obj.get("history") or {}).get("nodes")
+            if nodes:
+                dates[repo] = parse_commit_date(nodes[-1]["authoredDate"])
+    return dates
+
+def scan_batch_graphql(repos):
+    """Scan a batch of repos: GraphQL detection + adoption dates, REST fallback per repo."""
+    try:
+        found, failed = find_codeowners_locations_graphql(repos)
+    except Exception as e:
+        return [error_row(repo, e) for repo in repos]
+
+    paths = {repo: path for repo, (path, _) in found.items() if path}
     try:
-        text = base64.b64decode(content_b64).decode("utf-8", errors="ignore")
+        dates = earliest_commit_dates_graphql(paths) if paths else {}
     except Exception:
-        return 0
-    owners = set()
-    for line in text.splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
+        dates = {}
+
+    rows = []
+    for repo in repos:
+        if repo in failed:
+            rows.append(error_row(repo, failed[repo]))
+            continue
+        path, text = found[repo]
+        try:
+            if path and repo not in dates:
+                dates[repo] = earliest_commit_date_for_path(repo, path)
+            rows.append(make_row(repo, path, text, dates.get(repo)))
+        except Exception as e:
+            rows.append(error_row(repo, e))
+    return rows
+
+# ---------- Local git backend ----------
+class LocalMirrors:
+    """
+    Index of local git mirrors under a root directory, keyed by lowercased owner/repo.
+    Accepts <root>/<owner>/<repo>.git bare clones as well as plain <root>/<owner>/<repo> checkouts.
+    """
+
+    def __init__(self, root):
+        self.dirs = {}
+        for owner in os.listdir(root):
+            owner_dir = os.path.join(root, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for name in os.listdir(owner_dir):
+                repo_dir = os.path.join(owner_dir, name)
+                git_dir = os.path.join(repo_dir, ".git")
+                if os.path.isdir(git_dir):
+                    repo_dir = git_dir
+                elif not os.path.isfile(os.path.join(repo_dir, "HEAD")):
+                    continue
+                repo = name[:-4] if name.endswith(".git") else name
+                self.dirs[f"{owner}/{repo}".lower()] = repo_dir
+
+    def git_dir(self, repo_full):
+        git_dir = self.dirs.get(repo_full.lower())
+        if git_dir is None:
+            raise FileNotFoundError(f"No local mirror for {repo_full}")
+        return git_dir
+
+def git(git_dir, *args):
+    """Run a git command against 'git_dir' and return stdout as text."""
+    res = subprocess.run(["git", "--git-dir", git_dir, *args], capture_output=True, check=True)
+    return res.stdout.decode("utf-8", errors="ignore")
+
+def find_codeowners_location_git(git_dir):
+    """
+    Local find_codeowners_location(): one ls-tree for all candidates, then the blob text.
+    An empty mirror (unborn HEAD) has no CODEOWNERS, like the API's empty-repo 409.
+    """
+    try:
+        listing = git(git_dir, "ls-tree", "HEAD", "--", *CODEOWNERS_PATHS)
+    except subprocess.CalledProcessError:
+        if has_head_git(git_dir):
+            raise
+        return None, None
+    found = {}
+    for line in listing.splitlines():
+        meta, _, path = line.partition("\t")
+        _, obj_type, sha = meta.split()
+        if obj_type == "blob":
+            found[path] = sha
+    for path in CODEOWNERS_PATHS:
+        if path in found:
+            return path, git(git_dir, "cat-file", "blob", found[path])
+    return None, None
+
+def has_head_git(git_dir):
+    """False for an empty repository, whose HEAD points at a branch with no commits yet."""
+    res = subprocess.run(["git", "--git-dir", git_dir, "rev-parse", "--verify", "-q", "HEAD"], capture_output=True)
+    return res.returncode == 0
+
+def list_files_git(git_dir):
+    """Paths of every file at HEAD."""
+    return git(git_dir, "ls-tree", "-r", "-z", "--name-only", "HEAD").split("\0")[:-1]
+
+def earliest_commit_date_git(git_dir, path):
+    """Local earliest_commit_date_for_path(): author date of the commit that first added 'path'."""
+    out = git(git_dir, "log", "--diff-filter=A", "--reverse", "--format=%aI", "HEAD", "--", path)
+    first = out.split("\n", 1)[0].strip()
+    return parse_commit_date(first) if first else None
+
+def scan_repo_git(repo, mirrors):
+    """scan_repo() against a local mirror instead of the API."""
+    try:
+        git_dir = mirrors.git_dir(repo)
+        path, text = find_codeowners_location_git(git_dir)
+        dt = earliest_commit_date_git(git_dir, path) if path else None
+        return make_row(repo, path, text, dt, files=partial(list_files_git, git_dir))
+    except Exception as e:
+        return error_row(repo, e)
+
+def scan_batch_git(repos, mirrors):
+    return [scan_repo_git(repo, mirrors) for repo in repos]
+
+# ---------- Checkpoint journal ----------
+class ScanJournal:
+    """
+    Write-ahead journal of finished repos (SQLite, WAL mode).
+    Every row is committed on its own, so a crash loses at most the repo in flight and
+    resume is a primary-key lookup per repo instead of re-reading the output file.
+    The CSV/Parquet output is materialized from the journal at the end of a run.
+    """
+
+    def __init__(self, path):
+        # Lookups may come from the thread feeding the async backend, writes from main()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS done (repo_name TEXT PRIMARY KEY, row TEXT, status TEXT)")
+        if "status" not in [c[1] for c in self.db.execute("PRAGMA table_info(done)")]:
+            self.db.execute("ALTER TABLE done ADD COLUMN status TEXT DEFAULT 'ok'")
+        self.db.commit()
+
+    def __contains__(self, repo):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM done WHERE repo_name = ?", (repo,)).fetchone() is not None
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+
+    def record(self, row):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO done VALUES (?, ?, ?)",
+                            (row["repo_name"], json.dumps(row), row["status"]))
+
+    def failed(self):
+        """Retry queue: repos whose last scan ended with status=error."""
+        return [r for (r,) in self.db.execute("SELECT repo_name FROM done WHERE status = 'error' ORDER BY rowid")]
+
+    def rows(self):
+        for (row,) in self.db.execute("SELECT row FROM done ORDER BY rowid"):
+            yield json.loads(row)
+
+    def import_output(self, path):
+        """Seed the journal from a CSV/Parquet output written by an older run (bad lines are skipped)."""
+        with self.db:
+            for row in read_output_rows(path):
+                self.db.execute("INSERT OR IGNORE INTO done VALUES (?, ?, ?)",
+                                (row["repo_name"], json.dumps(row), row["status"]))
+
+    def materialize(self, out_path):
+        """Atomically (re)write the output from the journal."""
+        write_output_rows(self.rows(), out_path)
+
+    def close(self):
+        self.db.close()
+
+def read_output_rows(path):
+    """Yield normalized rows from a scan output CSV/Parquet; malformed lines are skipped.
+    Error rows keep their empty (None) result columns."""
+    if path.endswith(".parquet"):
+        import pandas as pd
+        yield from normalize_output_rows(
+            pd.read_parquet(path).astype(object).where(lambda d: d.notna(), None).to_dict("records"))
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from normalize_output_rows(csv.DictReader(f))
+
+def normalize_output_rows(records):
+    """Rows of a scan output (CSV strings or Parquet values) with their output types restored."""
+    for row in records:
+        if not row.get("repo_name"):
+            continue
+        status = row.get("status") or "ok"   # files predating the status column
+        try:
+            yield {
+                "repo_name": row["repo_name"],
+                "has_codeowners": str(row["has_codeowners"]) == "True" if status == "ok" else None,
+                "codeowners_created_at": row["codeowners_created_at"] or "",
+                "owners_count": int(row["owners_count"]) if status == "ok" else None,
+                # Files predating the metric columns (or error rows) leave them empty
+                **{k: cast(row[k]) if row.get(k) not in (None, "") else None for k, cast in METRIC_FIELDS.items()},
+                "status": status,
+                "error": row.get("error") or "",
+            }
+        except (KeyError, TypeError, ValueError):   # ok rows missing their result columns
             continue
-        for m in HANDLE_RE.findall(line):
-            owners.add(m.lower())
-    return len(owners)
+
+def write_output_rows(rows, out_path):
+    """Atomically write rows as CSV, or Parquet for a .parquet path."""
+    tmp_path = out_path + ".tmp"
+    if out_path.endswith(".parquet"):
+        import pandas as pd
+        df = pd.DataFrame(list(rows), columns=OUTPUT_FIELDS)
+        # Error rows leave the result columns empty; keep the counts integer rather than float64
+        ints = ["owners_count"] + [k for k, cast in METRIC_FIELDS.items() if cast is int]
+        df = df.astype({"has_codeowners": "boolean", **dict.fromkeys(ints, "Int64")})
+        df.to_parquet(tmp_path, index=False)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp_path, out_path)
+
+# ---------- Sharding ----------
+SHARD_RE = re.compile(r"\.shard-(\d+)-of-(\d+)(?=\.[^.]+$)")
+
+def parse_shard(spec):
+    """argparse type for --shard i/N (0-based i)."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected i/N, e.g. 0/4")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError("need 0 <= i < N")
+    return i, n
+
+def shard_of(repo, n):
+    """Deterministic shard index for a repo (stable across processes and machines)."""
+    return zlib.crc32(repo.lower().encode("utf-8")) % n
+
+def shard_path(path, i, n):
+    """codeowners_meta.csv -> codeowners_meta.shard-0-of-4.csv"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{i}-of-{n}{ext}"
+
+def merge_shards(argv):
+    """
+    'merge' subcommand: combine shard outputs, dedupe by repo_name (a status=ok row beats
+    an error row) and check coverage against the input list. Exits 1 if repos are missing.
+    """
+    ap = argparse.ArgumentParser(prog="codeowners_scan.py merge")
+    ap.add_argument("output", help="Merged output CSV (or .parquet)")
+    ap.add_argument("shards", nargs="+", help="Shard outputs written with --shard")
+    ap.add_argument("--input", default=None, help="Input CSV the shards were cut from, to validate coverage")
+    ap.add_argument("--limit", type=int, default=None, help="Same --limit the shards were run with")
+    args = ap.parse_args(argv)
+
+    merged, misplaced = {}, 0
+    for path in args.shards:
+        m = SHARD_RE.search(path)
+        for row in read_output_rows(path):
+            if m and shard_of(row["repo_name"], int(m.group(2))) != int(m.group(1)):
+                misplaced += 1
+            prev = merged.get(row["repo_name"])
+            if prev is None or prev["status"] != "ok" or row["status"] == "ok":
+                merged[row["repo_name"]] = row
+    write_output_rows(merged.values(), args.output)
+
+    failed = sum(1 for row in merged.values() if row["status"] != "ok")
+    print(f"Merged {len(args.shards)} shards -> {args.output}: {len(merged)} repos, {failed} with status=error")
+    if misplaced:
+        print(f"WARNING: {misplaced} rows sit in a shard their repo does not hash to", file=sys.stderr)
+    if args.input:
+        expected, missing = 0, []
+        for repo in iter_repo_names(args.input, args.limit):
+            expected += 1
+            if repo not in merged:
+                missing.append(repo)
+        if missing:
+            print(f"ERROR: {len(missing)} input repos missing from the shards, e.g. {missing[:5]}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Coverage OK: all {expected} input repos present")
+
+# ---------- Input ----------
+def iter_repo_names(input_csv, limit=None):
+    """
+    Stream the repo_name column of the input CSV ('-' reads stdin), stopping after
+    'limit' rows, so scanning starts before a large list has been read.
+    """
+    f = sys.stdin if input_csv == "-" else open(input_csv, newline="", encoding="utf-8")
+    try:
+        reader = csv.DictReader(f)
+        if "repo_name" not in (reader.fieldnames or []):
+            raise ValueError("Input CSV must have a 'repo_name' column (e.g., owner/repo).")
+        names = (row["repo_name"].strip() for row in reader)
+        yield from (itertools.islice(names, limit) if limit else names)
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
 # ---------- Main ----------
-def scan_repo(repo):
-    """Return dict with scan results for a single repo."""
+def scan_repo(repo, find=find_codeowners_location):
+    """Return dict with scan results for a single repo ('find' is the detection strategy)."""
+    try:
+        path, content_b64 = find(repo)
+        dt = earliest_commit_date_for_path(repo, path) if path else None
+        return make_row(repo, path, iter_content_b64(content_b64), dt)
+    except Exception as e:
+        # Be resilient: record the failure instead of a (false) negative
+        return error_row(repo, e)
+
+def make_row(repo, path=None, text=None, created_at=None, files=None):
+    """
+    Build the output row for a repo from its detection/adoption results. 'text' is the
+    CODEOWNERS content (str, bytes or bytes chunks); 'files' optionally lists the repo's
+    files, or is a callable returning them, for catchall_coverage.
+    """
+    has = path is not None
+    owners_count, table = scan_codeowners(text if has else "")
+    if callable(files):
+        # Listing the tree only pays off if some rule could be a catch-all
+        files = files() if CATCH_ALL_PATTERNS.intersection(table.patterns) else None
+    # No file, no ownership metrics: empty, as in rows imported from older outputs
+    metrics = owner_metrics(table, files) if has else dict.fromkeys(METRIC_FIELDS)
+    return {
+        "repo_name": repo,
+        "has_codeowners": bool(has),
+        "codeowners_created_at": created_at.isoformat() if created_at else "",
+        "owners_count": owners_count,
+        **metrics,
+        "status": "ok",
+        "error": ""
+    }
+
+def scan_codeowners(text):
+    """
+    (owners_count, RuleTable) from one streaming pass over CODEOWNERS content (str, bytes
+    or line-aligned bytes chunks as from iter_content_b64()): every chunk goes through
+    OwnerCounter and the rule parser in turn. Undecodable content counts as empty.
+    """
+    if not text:
+        text = ()
+    elif isinstance(text, str):
+        text = (text.encode("utf-8", errors="ignore"),)
+    elif isinstance(text, bytes):
+        text = (text,)
+    counter = OwnerCounter()
+
+    def counted(chunks):
+        # Each chunk is counted and parsed while it is in hand; the file is never joined
+        for data in chunks:
+            counter.feed(data)
+            yield data
+
+    try:
+        table = parse_codeowners(counted(text))
+    except binascii.Error:
+        return 0, parse_codeowners("")
+    return counter.count(), table
+
+def error_row(repo, exc):
+    """Row for a repo whose scan failed: results unknown (empty), status=error."""
+    return {
+        "repo_name": repo,
+        "has_codeowners": None,
+        "codeowners_created_at": "",
+        "owners_count": None,
+        **dict.fromkeys(METRIC_FIELDS),
+        "status": "error",
+        "error": f"{type(exc).__name__}: {exc}"[:300]
+    }
+
+def scan_batch(repos, find=find_codeowners_location):
+    """Scan a batch of repos one by one through the REST API."""
+    return [scan_repo(repo, find) for repo in repos]
+
+def chunked(items, size):
+    """Yield lists of up to 'size' consecutive items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def scan_repos(repos, workers=1, detect="contents", batch_size=GRAPHQL_BATCH, git_root=None):
+    """
+    Yield result rows for 'repos'.
+    detect="contents"/"tree" scans repo by repo; detect="graphql" scans batches of 'batch_size';
+    a 'git_root' of local mirrors replaces the API entirely.
+    With workers > 1, units are fanned out over a bounded thread pool sharing the client's sessions;
+    rows are yielded in completion order so the caller stays the single writer.
+    """
+    if git_root:
+        scan_unit, units = partial(scan_batch_git, mirrors=LocalMirrors(git_root)), chunked(repos, 1)
+    elif detect == "graphql":
+        scan_unit, units = scan_batch_graphql, chunked(repos, batch_size)
+    elif detect == "tree":
+        scan_unit, units = partial(scan_batch, find=find_codeowners_location_tree), chunked(repos, 1)
+    else:
+        scan_unit, units = scan_batch, chunked(repos, 1)
+
+    if workers <= 1:
+        for unit in units:
+            yield from scan_unit(unit)
+        return
+
+    ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+    pending = set()
+    max_inflight = workers * INFLIGHT_PER_WORKER
     try:
-        path, content_b64 = find_codeowners_location(repo)
-        has = path is not None
-        owners_count = count_unique_owners_from_content_b64(content_b64) if has else 0
-        created_at_iso = ""
-        if has:
-            dt = earliest_commit_date_for_path(repo, path)
-            created_at_iso = dt.isoformat() if dt else ""
-        return {
-            "repo_name": repo,
-            "has_codeowners": bool(has),
-            "codeowners_created_at": created_at_iso,
-            "owners_count": int(owners_count)
-        }
+        for unit in units:
+            pending.add(ex.submit(scan_unit, unit))
+            if len(pending) >= max_inflight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield from f.result()
+        for f in list(pending):
+            yield from f.result()
+            pending.discard(f)
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+# ---------- Async backend (optional: httpx[http2]) ----------
+class AsyncGitHub:
+    """
+    HTTP/2 httpx.AsyncClient plus a semaphore bounding in-flight requests. Tokens, budgets,
+    cache and retry policy come from a GitHubClient ('api'); auth is set per request.
+    """
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, api=None):
+        import asyncio
+        self.api = api or get_client()
+        try:
+            import httpx
+            self.client = httpx.AsyncClient(
+                http2=True,
+                headers=API_HEADERS,
+                timeout=self.api.timeout,
+                follow_redirects=True,
+            )
+        except ImportError:
+            raise RuntimeError("--async needs httpx with HTTP/2 support: pip install 'httpx[http2]'")
+        self.sem = asyncio.Semaphore(concurrency)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+async def async_gh_get(gh, url, params=None, ok404=False, retries=None):
+    """Async gh_get(): same rate-limit handling + retries/backoff, bounded by gh.sem."""
+    import asyncio
+    import httpx
+    retries = gh.api.retries if retries is None else retries
+    cache = gh.api.cache
+    key = entry = None
+    if cache is not None:
+        key = cache.key(url, params)
+        entry = cache.get(key)
+
+    backoff = gh.api.backoff
+    for attempt in range(retries + 1):
+        slot = gh.api.pick()
+        limiter = slot.limiters["core"]
+        await asyncio.sleep(limiter.reserve())
+        try:
+            async with gh.sem:
+                r = await gh.client.get(url, params=params,
+                                        headers={"Authorization": slot.auth, **ResponseCache.validators(entry)})
+        except httpx.TransportError:
+            if attempt < retries:
+                await asyncio.sleep(backoff); backoff *= 2; continue
+            raise
+        limiter.update(r.headers)
+
+        outcome, sleep_s = classify_response(r.status_code, r.headers, entry is not None, ok404, backoff,
+                                             slot.label)
+        if outcome == CACHED:
+            limiter.refund()
+            return httpx.Response(entry["status"], headers=entry["headers"], content=entry["body"],
+                                  request=r.request)
+        if outcome == THROTTLED:
+            # Pause every coroutine on this token, not just this one
+            limiter.pause(sleep_s)
+            continue
+        if outcome == ABSENT:
+            return None
+        if outcome == RETRY:
+            if attempt < retries:
+                await asyncio.sleep(backoff); backoff *= 2; continue
+            r.raise_for_status()
+        if key:
+            cache.put(key, r.status_code, r.headers, r.content)
+        return r
+
+    raise RuntimeError(f"Failed after retries: {url}")
+
+async def async_default_head_sha(gh, repo_full):
+    """Async default_head_sha()."""
+    owner, repo = repo_full.split("/", 1)
+    r = await async_gh_get(gh, f"https://api.github.com/repos/{owner}/{repo}/commits",
+                           params={"per_page": 1}, ok404=True)
+    commits = r.json() if r is not None else None
+    return commits[0]["sha"] if commits else None
+
+async def async_find_codeowners_location(gh, repo_full):
+    """Async find_codeowners_location(), negative cache included."""
+    owner, repo = repo_full.split("/", 1)
+    cache = gh.api.cache
+    head = await async_default_head_sha(gh, repo_full) if negative_cache_enabled(cache) else None
+    for path in CODEOWNERS_PATHS:
+        if head and cache.is_absent(repo_full, path, head):
+            continue
+        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
+        r = await async_gh_get(gh, url, ok404=True)
+        if r is None:
+            if head:
+                cache.mark_absent(repo_full, path, head)
+            continue
+        content = contents_file_b64(r.json())
+        if content is not None:
+            return path, content
+    return None, None
+
+async def async_earliest_commit_date_for_path(gh, repo_full, path):
+    """Async earliest_commit_date_for_path()."""
+    owner, repo = repo_full.split("/", 1)
+    base = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    r = await async_gh_get(gh, base, params={"path": path, "per_page": 1})
+    if r.status_code == 200 and not r.json():
+        return None
+
+    last_url = link_last_url(r.headers.get("Link", ""))
+    if last_url:
+        commits = (await async_gh_get(gh, last_url)).json()
+    else:
+        commits = r.json()
+    return oldest_commit_date(commits)
+
+async def async_scan_repo(gh, repo):
+    """Async scan_repo()."""
+    try:
+        path, content_b64 = await async_find_codeowners_location(gh, repo)
+        dt = await async_earliest_commit_date_for_path(gh, repo, path) if path else None
+        return make_row(repo, path, iter_content_b64(content_b64), dt)
     except Exception as e:
-        # Be resilient: return a safe default row
-        return {
-            "repo_name": repo,
-            "has_codeowners": False,
-            "codeowners_created_at": "",
-            "owners_count": 0
-        }
+        return error_row(repo, e)
+
+async def _async_scan_all(repos, concurrency, emit):
+    """Scan 'repos' on one event loop, keeping a bounded window of repo tasks."""
+    import asyncio
+    gh = AsyncGitHub(concurrency)
+    pending = set()
+    try:
+        for repo in repos:
+            pending.add(asyncio.ensure_future(async_scan_repo(gh, repo)))
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    emit(t.result())
+        for t in asyncio.as_completed(pending):
+            emit(await t)
+    finally:
+        for t in pending:
+            t.cancel()
+        await gh.aclose()
+
+def scan_repos_async(repos, concurrency=ASYNC_CONCURRENCY):
+    """
+    Yield rows from the async backend.
+    The event loop runs in a helper thread so the caller stays the single writer.
+    """
+    import asyncio
+    rows = queue.Queue()
+    sentinel = object()
+    failure = []
+
+    def run():
+        try:
+            asyncio.run(_async_scan_all(repos, concurrency, rows.put))
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            rows.put(sentinel)
+
+    t = threading.Thread(target=run, name="scan-async", daemon=True)
+    t.start()
+    while True:
+        row = rows.get()
+        if row is sentinel:
+            break
+        yield row
+    t.join()
+    if failure:
+        raise failure[0]
 
 def main():
+    if sys.argv[1:2] == ["merge"]:
+        return merge_shards(sys.argv[2:])
+
     ap = argparse.ArgumentParser()
-    ap.add_argument("input_csv", nargs="?", default=DEFAULT_IN, help="Input CSV with repo_name column")
-    ap.add_argument("output_csv", nargs="?", default=DEFAULT_OUT, help="Output CSV path")
+    ap.add_argument("input_csv", nargs="?", default=DEFAULT_IN,
+                    help="Input CSV with repo_name column ('-' for stdin)")
+    ap.add_argument("output_csv", nargs="?", default=DEFAULT_OUT, help="Output CSV (or .parquet) path")
     ap.add_argument("--limit", type=int, default=None, help="Process only the first N repos")
+    ap.add_argument("--workers", type=int, default=1, help="Scan N repos concurrently (default: 1, sequential)")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="Use the asyncio/HTTP-2 backend instead of worker threads (needs httpx[http2])")
+    ap.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY,
+                    help=f"Max in-flight requests for --async (default: {ASYNC_CONCURRENCY})")
+    ap.add_argument("--detect", choices=["contents", "tree", "graphql"], default="contents",
+                    help="CODEOWNERS detection: per-repo REST contents probes, git tree listing, "
+                         "or batched GraphQL")
+    ap.add_argument("--batch-size", type=int, default=GRAPHQL_BATCH,
+                    help=f"Repos per GraphQL query with --detect graphql (default: {GRAPHQL_BATCH})")
+    ap.add_argument("--cache", default=None, metavar="FILE",
+                    help="SQLite HTTP cache; re-runs send conditional requests and reuse 304s")
+    ap.add_argument("--negative-ttl-days", type=float, default=NEGATIVE_TTL_DAYS,
+                    help="With --cache, skip CODEOWNERS paths that 404'd at the same HEAD within this "
+                         f"many days (default: {NEGATIVE_TTL_DAYS}; 0 disables)")
+    ap.add_argument("--retry-failed", action="store_true",
+                    help="Only re-scan repos the journal has with status=error")
+    ap.add_argument("--retry-workers", type=int, default=RETRY_WORKERS,
+                    help=f"Workers (or --async concurrency) for --retry-failed (default: {RETRY_WORKERS})")
+    ap.add_argument("--retry-backoff", type=float, default=RETRY_BACKOFF_S,
+                    help=f"Initial retry backoff in seconds for --retry-failed (default: {RETRY_BACKOFF_S})")
+    ap.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                    help="Scan only hash partition i of N (0-based) into <output>.shard-i-of-N.<ext>")
+    ap.add_argument("--journal", default=None, metavar="FILE",
+                    help="Checkpoint journal used for resume (default: <output>.journal)")
+    ap.add_argument("--git-root", default=None, metavar="DIR",
+                    help="Scan local mirrors (<DIR>/<owner>/<repo>[.git]) with git instead of the API")
+    ap.add_argument("--timeout", type=float, default=TIMEOUT_S,
+                    help=f"Per-request timeout in seconds (default: {TIMEOUT_S})")
+    ap.add_argument("--retries", type=int, default=RETRIES,
+                    help=f"Retries per request on errors/5xx (default: {RETRIES})")
     args = ap.parse_args()
+    if args.use_async and args.detect != "contents":
+        ap.error("--async only supports --detect contents")
+    if args.use_async and args.git_root:
+        ap.error("--async and --git-root are mutually exclusive")
+    if args.retry_failed:
+        # The retry pass runs at its own concurrency in both backends
+        args.workers = args.concurrency = args.retry_workers
 
-    # Load repos
-    df = pd.read_csv(args.input_csv)
-    if "repo_name" not in df.columns:
-        raise ValueError("Input CSV must have a 'repo_name' column (e.g., owner/repo).")
-
-    repos = df["repo_name"].astype(str).tolist()
-    if args.limit:
-        repos = repos[: args.limit]
-
-    # Prepare writer (incremental flush to avoid losing progress)
-    out_exists = os.path.exists(args.output_csv)
-    out_file = open(args.output_csv, "a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(out_file,
-                            fieldnames=["repo_name","has_codeowners","codeowners_created_at","owners_count"])
-    if not out_exists:
-        writer.writeheader()
-
-    # Track already written repos to support resume/appends
-    written = set()
-    if out_exists:
+    # API client: one keep-alive pool per token, sized so workers never queue on it
+    client = None
+    if not args.git_root:
         try:
-            prev = pd.read_csv(args.output_csv)
-            if "repo_name" in prev.columns:
-                written = set(prev["repo_name"].astype(str).tolist())
-        except Exception:
-            pass
-
-    # Scan
-    pbar = tqdm(repos, desc="Scanning repos")
-    n = 0
-    for repo in pbar:
-        if repo in written:
-            continue
-        row = scan_repo(repo)
-        writer.writerow(row)
-        n += 1
-        if n % 100 == 0:
-            out_file.flush()
-
-    out_file.flush()
-    out_file.close()
+            client = GitHubClient(
+                pool_maxsize=max(args.workers, POOL_MAXSIZE),
+                timeout=args.timeout,
+                retries=args.retries,
+                backoff=args.retry_backoff if args.retry_failed else BACKOFF_S,
+                cache=ResponseCache(args.cache, args.negative_ttl_days) if args.cache else None,
+            )
+        except RuntimeError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+        set_client(client)
+
+    # Stream repos (nothing is read until the scan pulls the next one)
+    repos = iter_repo_names(args.input_csv, args.limit)
+    if args.shard:
+        i, n = args.shard
+        repos = (r for r in repos if shard_of(r, n) == i)
+        args.output_csv = shard_path(args.output_csv, i, n)
+
+    # Journal of finished repos drives resume; older runs' output (CSV or Parquet) is imported once
+    journal_path = args.journal or args.output_csv + ".journal"
+    fresh_journal = not os.path.exists(journal_path)
+    journal = ScanJournal(journal_path)
+    if fresh_journal and os.path.exists(args.output_csv):
+        journal.import_output(args.output_csv)
+
+    # Scan (workers only fetch; this loop is the single journal writer)
+    if args.retry_failed:
+        todo = journal.failed()
+        total = len(todo)
+        print(f"Retrying {total} failed repos", file=sys.stderr)
+    else:
+        todo = (r for r in repos if r not in journal)
+        total = None   # unknown until the input stream ends
+
+    if args.use_async:
+        rows = scan_repos_async(todo, args.concurrency)
+    else:
+        rows = scan_repos(todo, args.workers, args.detect, args.batch_size, args.git_root)
+    try:
+        from tqdm import tqdm
+        for row in tqdm(rows, total=total, desc="Scanning repos"):
+            journal.record(row)
+    finally:
+        journal.materialize(args.output_csv)
+        journal.close()
+        if client is not None:
+            client.close()
     print(f"✅ Done. Wrote/updated: {args.output_csv}")
 
 if __name__ == "__main__":
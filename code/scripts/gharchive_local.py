@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+gharchive_local.py
+Run the GH Archive steps of the workflow on local hourly dumps instead of BigQuery.
+
+Reads the hourly YYYY-MM-DD-H.json.gz files from https://www.gharchive.org/ (one JSON
+event per line), streaming each file. Lines are filtered on raw bytes before any JSON
+parsing, so events of other types cost one substring search each.
+
+Every step is a map/reduce over hour files: a pool of worker processes maps each file
+to a small partial aggregate (per-repo counters, per-PR minimum timestamps), and the
+parent merges partials as they arrive; merges are associative, so order never matters.
+With --partials DIR each file's partial is pickled under DIR/<step>/, and a re-run only
+maps hour files that are new (or changed size/mtime) since.
+
+Subcommands:
+  active   Count PullRequestEvent 'opened' actions per lowercased repo -> active_repos.csv
+           (repo_name,pr_events), like code/sql/active_repos_pr.sql.
+  top      The K most active repos -> active_repos_top2000.csv, like
+           code/sql/actve_repos_pr_top_2000.sql, from active_repos.csv or straight from
+           the hour files (exact counts, or a count-min sketch + heap with --sketch).
+  merges   Merged PRs of the sample repos -> pr_merge_latency_sample (repo_name,pr_number,
+           pr_open_ts,pr_merge_ts,hours_to_merge), like the first half of
+           code/sql/mergelatency_reviewlatency_final.sql; CSV, or Parquet for a .parquet path.
+  reviews  First review of each sample-repo PR -> pr_review_latency_sample (repo_name,
+           pr_number,first_review_any_ts): the earliest PullRequestReviewEvent or
+           PullRequestReviewCommentEvent, the second half of the same query.
+
+Inputs are hour files, directories of them, or glob patterns; --since/--until (YYYY-MM-DD)
+restrict them by the date in the file name (the study window is 2024-01-01 .. 2025-09-30).
+
+Usage examples:
+  python gharchive_local.py active /data/gharchive active_repos.csv --workers 16
+  python gharchive_local.py active '/data/gharchive/2024-0*.json.gz' active_repos.csv
+  python gharchive_local.py active /data/gharchive active_repos.csv --since 2024-01-01 --until 2025-09-30
+  python gharchive_local.py active /data/gharchive active_repos.csv --partials /data/gharchive-partials
+  python gharchive_local.py top active_repos.csv active_repos_top2000.csv --k 2000
+  python gharchive_local.py top /data/gharchive active_repos_top2000.csv --sketch
+  python gharchive_local.py merges /data/gharchive pr_merge_latency_sample.parquet --sample active_repos_top2000.csv
+  python gharchive_local.py reviews /data/gharchive pr_review_latency_sample.parquet --sample active_repos_top2000.csv
+"""
+
+import os
+import sys
+import re
+import csv
+import glob
+import gzip
+import io
+import json
+import zlib
+import heapq
+import pickle
+import hashlib
+import argparse
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from multiprocessing import Pool
+
+# ---------- Config ----------
+HOUR_FILE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})-(\d{1,2})\.json\.gz$")
+PR_EVENT = b'"type":"PullRequestEvent"'
+OPENED = b'"action":"opened"'
+MERGED = b'"merged_at":"'          # merged_at present and not null
+REVIEW_EVENTS = (b'"type":"PullRequestReviewEvent"', b'"type":"PullRequestReviewCommentEvent"')
+REPO_NAME = b'"name":"'
+READ_BUFFER = 1 << 20     # gzip read buffer per file
+TOP_K = 2000
+SKETCH_WIDTH = 1 << 18    # counters per count-min row (--sketch)
+SKETCH_DEPTH = 4          # count-min rows (--sketch)
+
+# ---------- Input files ----------
+def hour_files(inputs, since=None, until=None):
+    """
+    Expand files/directories/globs into hour files sorted chronologically, keeping those
+    whose date lies in [since, until] (inclusive, YYYY-MM-DD strings).
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            found.update(os.path.join(item, name) for name in os.listdir(item))
+        elif glob.has_magic(item):
+            found.update(glob.glob(item))
+        else:
+            found.add(item)
+    files = []
+    for path in found:
+        m = HOUR_FILE_RE.search(os.path.basename(path))
+        if not m:
+            continue
+        day = m.group(1)
+        if (since and day < since) or (until and day > until):
+            continue
+        files.append((day, int(m.group(2)), path))
+    return [path for _, _, path in sorted(files)]
+
+# Hour files whose read was cut short in this process (see map_file())
+INCOMPLETE = set()
+
+def iter_lines(path):
+    """
+    Raw event lines of one hour file (bytes); a truncated/corrupt tail ends the file early
+    and flags the path in INCOMPLETE.
+    """
+    try:
+        with gzip.open(path, "rb") as raw:
+            yield from io.BufferedReader(raw, READ_BUFFER)
+    except (EOFError, OSError, zlib.error) as e:
+        INCOMPLETE.add(path)
+        print(f"WARNING: {path}: {type(e).__name__}: {e} (rest of file skipped)", file=sys.stderr)
+
+def utc_ts(value):
+    """GitHub timestamp as 'YYYY-MM-DDTHH:MM:SSZ' (UTC), so timestamps compare as strings."""
+    if len(value) == 20 and value.endswith("Z"):
+        return value
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_ts(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+def hours_between(start, end):
+    """Whole hours from start to end, truncated toward zero (BigQuery TIMESTAMP_DIFF(end, start, HOUR))."""
+    seconds = int((parse_ts(end) - parse_ts(start)).total_seconds())
+    return seconds // 3600 if seconds >= 0 else -(-seconds // 3600)
+
+def raw_repo_name(line):
+    """
+    Lowercased repo name read off the raw event bytes (no JSON parse), or None if the
+    top-level "repo" object does not come before "payload" (where nested repos live).
+    """
+    start = line.find(b'"repo":{')
+    if start < 0 or start > line.find(b'"payload":'):
+        return None
+    start = line.find(REPO_NAME, start)
+    if start < 0:
+        return None
+    start += len(REPO_NAME)
+    end = line.find(b'"', start)
+    return line[start:end].decode("utf-8", errors="ignore").lower() if end > 0 else None
+
+# ---------- Sample set ----------
+SAMPLE = frozenset()   # lowercased sample repos, set in each worker by use_sample()
+
+def load_sample(path):
+    """Lowercased repo_name column of the sample CSV (e.g. active_repos_top2000.csv)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if "repo_name" not in (reader.fieldnames or []):
+            raise ValueError(f"{path}: sample CSV must have a 'repo_name' column")
+        return frozenset(row["repo_name"].strip().lower() for row in reader)
+
+def use_sample(sample):
+    """Pool initializer: install the sample set in a worker."""
+    global SAMPLE
+    SAMPLE = sample
+
+def sample_step(step, sample):
+    """Partials subdirectory for a sample-filtered step; a different sample never reuses them."""
+    digest = hashlib.blake2b("\n".join(sorted(sample)).encode("utf-8"), digest_size=6).hexdigest()
+    return f"{step}-{digest}"
+
+# ---------- Map/reduce ----------
+def partial_path(partials_dir, step, path):
+    """Where the partial of hour file 'path' for 'step' is persisted."""
+    return os.path.join(partials_dir, step, os.path.basename(path) + ".pkl")
+
+def file_stamp(path):
+    """(size, mtime_ns) of an hour file; a persisted partial is only reused if it still matches."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def load_partial(path, pkl_path):
+    """The persisted partial of 'path', or None if missing, stale or unreadable."""
+    try:
+        with open(pkl_path, "rb") as f:
+            stamp, partial = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return partial if stamp == file_stamp(path) else None
+
+def map_file(task):
+    """
+    Worker: map one hour file, persisting the partial first if a path is given.
+    Returns (partial, complete); a partial from a file that could not be read to the
+    end is used for this run but never persisted, so the next run reads the file again.
+    """
+    mapper, path, pkl_path = task
+    INCOMPLETE.discard(path)
+    partial = mapper(path)
+    complete = path not in INCOMPLETE
+    if pkl_path and complete:
+        tmp_path = pkl_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((file_stamp(path), partial), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, pkl_path)
+    return partial, complete
+
+def map_reduce(files, mapper, merge, total, workers=1, partials_dir=None, step=None,
+               initializer=None, initargs=()):
+    """
+    Fold mapper(path) for every hour file into 'total' with merge(total, partial).
+    'mapper' must be a module-level function (it is pickled to the workers);
+    per-run parameters reach it through 'initializer'/'initargs'. With 'partials_dir',
+    partials are persisted per file under <partials_dir>/<step>/ and reused while
+    the file is unchanged.
+    """
+    from tqdm import tqdm
+    todo, reused = [], 0
+    if partials_dir:
+        os.makedirs(os.path.join(partials_dir, step), exist_ok=True)
+    for path in files:
+        pkl_path = partial_path(partials_dir, step, path) if partials_dir else None
+        partial = load_partial(path, pkl_path) if pkl_path else None
+        if partial is None:
+            todo.append((mapper, path, pkl_path))
+        else:
+            merge(total, partial)
+            reused += 1
+    if reused:
+        print(f"Reusing {reused} persisted partials; mapping {len(todo)} hour files", file=sys.stderr)
+    incomplete = 0
+    if todo:
+        with Pool(workers, initializer, initargs) as pool:
+            for partial, complete in tqdm(pool.imap_unordered(map_file, todo), total=len(todo), desc="Hour files"):
+                merge(total, partial)
+                incomplete += not complete
+    if incomplete:
+        print(f"WARNING: {incomplete} hour files were only partly readable; results include what was read, "
+              f"and they will be read again on the next run", file=sys.stderr)
+    return total
+
+def merge_counts(total, partial):
+    """Reducer for Counter partials."""
+    total.update(partial)
+
+def merge_min(total, partial):
+    """Reducer for key -> timestamp partials: keep the earliest timestamp per key."""
+    for key, ts in partial.items():
+        prev = total.get(key)
+        if prev is None or ts < prev:
+            total[key] = ts
+
+# ---------- active: PR openings per repo ----------
+def count_opened(path):
+    """Map step: Counter of PullRequestEvent 'opened' actions per lowercased repo in one file."""
+    counts = Counter()
+    for line in iter_lines(path):
+        if PR_EVENT not in line or OPENED not in line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get("type") == "PullRequestEvent" and (event.get("payload") or {}).get("action") == "opened":
+            counts[event["repo"]["name"].lower()] += 1
+    return counts
+
+def write_counts(counts, out_path):
+    """Write repo_name,pr_events ordered by pr_events desc (ties by name), atomically."""
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["repo_name", "pr_events"])
+        writer.writerows(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+    os.replace(tmp_path, out_path)
+
+def cmd_active(args):
+    files = hour_files(args.inputs, args.since, args.until)
+    if not files:
+        print("ERROR: no hour files (YYYY-MM-DD-H.json.gz) found.", file=sys.stderr)
+        sys.exit(1)
+    totals = map_reduce(files, count_opened, merge_counts, Counter(), args.workers,
+                        args.partials, "active")
+    write_counts(totals, args.output)
+    print(f"✅ Done. {len(totals)} repos with PR openings from {len(files)} hour files -> {args.output}")
+
+# ---------- top: K most active repos ----------
+def top_k(rows, k):
+    """The k (repo, count) pairs with the highest counts, ties by name; O(n log k), streaming."""
+    return heapq.nsmallest(k, rows, key=lambda kv: (-kv[1], kv[0]))
+
+def iter_counts_csv(path):
+    """Stream (repo_name, pr_events) from an active_repos.csv."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row["repo_name"], int(row["pr_events"])
+
+class CountMinSketch:
+    """Count-min sketch over string keys: estimates never undercount, overcount is bounded by width."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.rows = [array("Q", bytes(8 * width)) for _ in range(depth)]
+
+    def _cells(self, key):
+        # Double hashing: row i uses h1 + i*h2
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.width for i in range(len(self.rows))]
+
+    def add(self, key, count=1):
+        """Add 'count' for 'key' and return its new estimate."""
+        estimate = None
+        for row, cell in zip(self.rows, self._cells(key)):
+            row[cell] += count
+            estimate = row[cell] if estimate is None else min(estimate, row[cell])
+        return estimate
+
+class NameDesc(str):
+    """str that sorts backwards: among equal counts the heap top is then the name that ranks last."""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return str.__gt__(self, other)
+
+class TopKSketch:
+    """
+    Heavy hitters of an unbounded stream in O(sketch + k) memory: a count-min sketch
+    estimates every repo's count and a min-heap keeps the k best estimates seen.
+    update(counts) merges a Counter partial, so it plugs into map_reduce(merge_counts).
+    """
+
+    def __init__(self, k, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.top = {}      # repo -> current estimate
+        self.heap = []     # (estimate, NameDesc(repo)); entries older than self.top are skipped lazily
+
+    def update(self, counts):
+        for repo, count in counts.items():
+            estimate = self.sketch.add(repo, count)
+            entry = (estimate, NameDesc(repo))
+            if repo in self.top or len(self.top) < self.k or self.heap[0] < entry:
+                self.top[repo] = estimate
+                heapq.heappush(self.heap, entry)
+                self._trim()
+
+    def _trim(self):
+        while len(self.top) > self.k or (self.heap and self.top.get(self.heap[0][1]) != self.heap[0][0]):
+            estimate, repo = heapq.heappop(self.heap)
+            if self.top.get(repo) == estimate:
+                del self.top[repo]
+        if len(self.heap) > 4 * self.k:
+            self.heap = [(e, NameDesc(r)) for r, e in self.top.items()]
+            heapq.heapify(self.heap)
+
+    def items(self):
+        return self.top.items()
+
+def cmd_top(args):
+    if len(args.inputs) == 1 and args.inputs[0].endswith(".csv"):
+        top = top_k(iter_counts_csv(args.inputs[0]), args.k)
+        source = args.inputs[0]
+    else:
+        files = hour_files(args.inputs, args.since, args.until)
+        if not files:
+            print("ERROR: no hour files (YYYY-MM-DD-H.json.gz) found.", file=sys.stderr)
+            sys.exit(1)
+        total = TopKSketch(args.k, args.sketch_width, args.sketch_depth) if args.sketch else Counter()
+        total = map_reduce(files, count_opened, merge_counts, total, args.workers, args.partials, "active")
+        top = top_k(total.items(), args.k)
+        source = f"{len(files)} hour files"
+    write_counts(dict(top), args.output)
+    print(f"✅ Done. Top {len(top)} repos from {source} -> {args.output}")
+
+# ---------- merges: PR merge latency ----------
+MERGE_FIELDS = ["repo_name", "pr_number", "pr_open_ts", "pr_merge_ts", "hours_to_merge"]
+
+def merged_prs(path):
+    """
+    Map step: (repo, pr_number) -> (merged_at, created_at) for merged PRs of sample repos.
+    A PR seen in several closed/merged events keeps its earliest merge.
+    """
+    merges = {}
+    for line in iter_lines(path):
+        if PR_EVENT not in line or MERGED not in line:
+            continue
+        name = raw_repo_name(line)
+        if name is not None and name not in SAMPLE:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        repo = event["repo"]["name"].lower()
+        pr = (event.get("payload") or {}).get("pull_request") or {}
+        if event.get("type") != "PullRequestEvent" or repo not in SAMPLE:
+            continue
+        if not pr.get("created_at") or not pr.get("merged_at") or pr.get("number") is None:
+            continue
+        key = (repo, str(pr["number"]))
+        value = (utc_ts(pr["merged_at"]), utc_ts(pr["created_at"]))
+        if key not in merges or value < merges[key]:
+            merges[key] = value
+    return merges
+
+def write_table(rows, fields, out_path, ts_fields=()):
+    """Atomically write rows as Parquet for a .parquet path (timestamps typed), else CSV."""
+    tmp_path = out_path + ".tmp"
+    if out_path.endswith(".parquet"):
+        import pandas as pd
+        df = pd.DataFrame(list(rows), columns=fields)
+        for field in ts_fields:
+            df[field] = pd.to_datetime(df[field], utc=True)
+        df.to_parquet(tmp_path, index=False)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            writer.writerows(rows)
+    os.replace(tmp_path, out_path)
+
+def cmd_merges(args):
+    files = hour_files(args.inputs, args.since, args.until)
+    if not files:
+        print("ERROR: no hour files (YYYY-MM-DD-H.json.gz) found.", file=sys.stderr)
+        sys.exit(1)
+    sample = load_sample(args.sample)
+    use_sample(sample)
+    merges = map_reduce(files, merged_prs, merge_min, {}, args.workers, args.partials,
+                        sample_step("merges", sample), initializer=use_sample, initargs=(sample,))
+    rows = ((repo, number, opened, merged, hours_between(opened, merged))
+            for (repo, number), (merged, opened) in sorted(merges.items(), key=pr_order))
+    write_table(rows, MERGE_FIELDS, args.output, ts_fields=("pr_open_ts", "pr_merge_ts"))
+    print(f"✅ Done. {len(merges)} merged PRs in {len({r for r, _ in merges})} sample repos -> {args.output}")
+
+def pr_order(item):
+    """Sort key: repo, then PR number numerically."""
+    (repo, number), _ = item
+    return repo, int(number) if number.isdigit() else 0, number
+
+# ---------- reviews: first review per PR ----------
+REVIEW_FIELDS = ["repo_name", "pr_number", "first_review_any_ts"]
+REVIEW_TYPES = {"PullRequestReviewEvent", "PullRequestReviewCommentEvent"}
+
+def first_reviews(path):
+    """
+    Map step: (repo, pr_number) -> earliest review or review-comment event time for
+    sample repos. One running minimum per PR, so memory follows PRs, not events.
+    """
+    firsts = {}
+    for line in iter_lines(path):
+        if REVIEW_EVENTS[0] not in line and REVIEW_EVENTS[1] not in line:
+            continue
+        name = raw_repo_name(line)
+        if name is not None and name not in SAMPLE:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        repo = event["repo"]["name"].lower()
+        pr = (event.get("payload") or {}).get("pull_request") or {}
+        if event.get("type") not in REVIEW_TYPES or repo not in SAMPLE or pr.get("number") is None:
+            continue
+        key = (repo, str(pr["number"]))
+        ts = utc_ts(event["created_at"])
+        if key not in firsts or ts < firsts[key]:
+            firsts[key] = ts
+    return firsts
+
+def cmd_reviews(args):
+    files = hour_files(args.inputs, args.since, args.until)
+    if not files:
+        print("ERROR: no hour files (YYYY-MM-DD-H.json.gz) found.", file=sys.stderr)
+        sys.exit(1)
+    sample = load_sample(args.sample)
+    use_sample(sample)
+    firsts = map_reduce(files, first_reviews, merge_min, {}, args.workers, args.partials,
+                        sample_step("reviews", sample), initializer=use_sample, initargs=(sample,))
+    rows = ((repo, number, ts) for (repo, number), ts in sorted(firsts.items(), key=pr_order))
+    write_table(rows, REVIEW_FIELDS, args.output, ts_fields=("first_review_any_ts",))
+    print(f"✅ Done. {len(firsts)} reviewed PRs in {len({r for r, _ in firsts})} sample repos -> {args.output}")
+
+# ---------- Main ----------
+def main():
+    ap = argparse.ArgumentParser(description="GH Archive workflow steps on local hourly dumps.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("active", help="PR openings per repo (active_repos.csv)")
+    p.add_argument("inputs", nargs="+", help="Hour files, directories or glob patterns")
+    p.add_argument("output", help="Output CSV (repo_name,pr_events)")
+    p.set_defaults(func=cmd_active)
+
+    p = sub.add_parser("top", help="K most active repos (active_repos_top2000.csv)")
+    p.add_argument("inputs", nargs="+", help="active_repos.csv, or hour files, directories or glob patterns")
+    p.add_argument("output", help="Output CSV (repo_name,pr_events)")
+    p.add_argument("--k", type=int, default=TOP_K, help=f"Number of repos to keep (default: {TOP_K})")
+    p.add_argument("--sketch", action="store_true",
+                   help="From hour files: count-min sketch + heap instead of exact counts for every repo "
+                        "(approximate, never undercounts)")
+    p.add_argument("--sketch-width", type=int, default=SKETCH_WIDTH, help=f"Counters per sketch row (default: {SKETCH_WIDTH})")
+    p.add_argument("--sketch-depth", type=int, default=SKETCH_DEPTH, help=f"Sketch rows (default: {SKETCH_DEPTH})")
+    p.set_defaults(func=cmd_top)
+
+    p = sub.add_parser("merges", help="Merge latency of sample-repo PRs (pr_merge_latency_sample)")
+    p.add_argument("inputs", nargs="+", help="Hour files, directories or glob patterns")
+    p.add_argument("output", help="Output CSV, or .parquet")
+    p.add_argument("--sample", required=True, help="CSV whose repo_name column is the sample (e.g. active_repos_top2000.csv)")
+    p.set_defaults(func=cmd_merges)
+
+    p = sub.add_parser("reviews", help="First review of sample-repo PRs (pr_review_latency_sample)")
+    p.add_argument("inputs", nargs="+", help="Hour files, directories or glob patterns")
+    p.add_argument("output", help="Output CSV, or .parquet")
+    p.add_argument("--sample", required=True, help="CSV whose repo_name column is the sample (e.g. active_repos_top2000.csv)")
+    p.set_defaults(func=cmd_reviews)
+
+    for p in sub.choices.values():
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="Worker processes (default: CPU count)")
+        p.add_argument("--since", default=None, metavar="YYYY-MM-DD", help="Skip hour files before this date")
+        p.add_argument("--until", default=None, metavar="YYYY-MM-DD", help="Skip hour files after this date")
+        p.add_argument("--partials", default=None, metavar="DIR",
+                       help="Persist per-hour-file partial aggregates here and reuse them on re-runs")
+
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()